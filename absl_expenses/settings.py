@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 
 # Lee variables de entorno desde .env si existe (solo local)
 try:
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 
 # --- Middleware (Whitenoise debe ir inmediatamente después de SecurityMiddleware)
 MIDDLEWARE = [
+    'expenses.timing.ServerTimingMiddleware',   # solo activo con SERVER_TIMING=True
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,6 +57,7 @@ TEMPLATES = [{
         'django.template.context_processors.request',
         'django.contrib.auth.context_processors.auth',
         'django.contrib.messages.context_processors.messages',
+        'expenses.roles.roles',   # is_manager en todos los templates
     ],},
 }]
 
@@ -75,6 +78,24 @@ else:
         }
     }
 
+# --- Cache de Django: compartido por todos los procesos (workers web, worker de exports, comandos).
+#     Las versiones de la lista de gastos y de los filtros viven acá: con un cache por proceso un cambio
+#     hecho en otro proceso no se vería. Con REDIS_URL va a Redis (requiere el paquete redis); si no, a
+#     una tabla de la BD que crea la migración 0013.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'expenses_cache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '20000'))},
+        }
+    }
+
 # --- Locale
 LANGUAGE_CODE = 'es-ar'
 TIME_ZONE = 'America/Los_Angeles'
@@ -97,6 +118,81 @@ MEDIA_ROOT = BASE_DIR / 'media'                   # dónde se guardan fotos subi
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# --- Lista de gastos: 'cursor' (keyset sobre fecha/id, costo plano) u 'offset' (?page=N clásico)
+EXPENSE_LIST_PAGINATION = os.getenv('EXPENSE_LIST_PAGINATION', 'cursor')
+
+# --- Export en segundo plano: horas que el ZIP queda disponible para descargar
+EXPORT_JOB_TTL_HOURS = int(os.getenv('EXPORT_JOB_TTL_HOURS', '24'))
+
+# --- Minutos que puede estar 'running' un export antes de darlo por colgado y volverlo a la cola
+EXPORT_JOB_TIMEOUT_MINUTES = int(os.getenv('EXPORT_JOB_TIMEOUT_MINUTES', '120'))
+
+# --- Fotos de recibos: se normalizan al subir (ver expenses/images.py)
+RECEIPT_IMAGE_FORMAT = os.getenv('RECEIPT_IMAGE_FORMAT', 'JPEG')   # JPEG o WEBP
+RECEIPT_MAX_SIDE = int(os.getenv('RECEIPT_MAX_SIDE', '2000'))      # px del lado mayor
+RECEIPT_IMAGE_QUALITY = int(os.getenv('RECEIPT_IMAGE_QUALITY', '80'))
+RECEIPT_THUMB_SIDE = int(os.getenv('RECEIPT_THUMB_SIDE', '320'))
+RECEIPT_PROCESS_WORKERS = int(os.getenv('RECEIPT_PROCESS_WORKERS', '0'))  # 0 = inline en el request
+
+# --- Minutos que el GC de archivos de recibos no toca un blob guardado o reusado (una subida que lo
+#     reusa tiene ese margen para crear su fila antes de que se lo considere huérfano)
+BLOB_GC_GRACE_MINUTES = int(os.getenv('BLOB_GC_GRACE_MINUTES', '60'))
+
+# --- Entrega de recibos (/recibos/<id>/): 'django' (streaming con Range), 'x-accel' (nginx) o
+#     'x-sendfile' (Apache/lighttpd). Con x-accel, nginx necesita un location internal en RECEIPT_ACCEL_PREFIX
+RECEIPT_SERVE_MODE = os.getenv('RECEIPT_SERVE_MODE', 'django')
+RECEIPT_ACCEL_PREFIX = os.getenv('RECEIPT_ACCEL_PREFIX', '/protected-media/')
+
+# --- Vistas async (correr con un server ASGI: ver Procfile); threads para I/O de storage por proceso
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+ASYNC_IO_WORKERS = int(os.getenv('ASYNC_IO_WORKERS', '16'))
+
+# --- Threads que leen recibos en paralelo al armar el ZIP
+EXPORT_IO_WORKERS = int(os.getenv('EXPORT_IO_WORKERS', '8'))
+
+# --- Cache de exports ya armados (disco local, LRU por tamaño total)
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', str(Path(tempfile.gettempdir()) / 'absl-expenses-exports'))
+EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', '512'))
+
+# --- Segundos que se cachea (por proceso) si un usuario es manager; los cambios de grupos lo invalidan
+#     en todos los procesos (versión en el cache compartido)
+ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', '300'))
+
+# --- Filtros de obra/usuario: hasta este número de opciones se arma el <select>; más, autocomplete
+FILTER_CHOICES_LIMIT = int(os.getenv('FILTER_CHOICES_LIMIT', '500'))
+FILTER_CHOICES_TTL = int(os.getenv('FILTER_CHOICES_TTL', '3600'))   # segundos (se invalida al guardar)
+
+# --- Export en partes: recibos máximos por parte (cada grupo obra/mes se corta en tramos si pasa)
+EXPORT_PART_MAX_RECEIPTS = int(os.getenv('EXPORT_PART_MAX_RECEIPTS', '2000'))
+
+# --- Export de novedades: la marca queda estos segundos antes del export (más que la transacción más
+#     larga que cargue gastos, p. ej. un import): lo que aún no commiteó entra en el próximo
+DELTA_EXPORT_MARGIN_SECONDS = int(os.getenv('DELTA_EXPORT_MARGIN_SECONDS', '300'))
+
+# --- Segundos que se guarda el render de la tabla de /gastos/ (cualquier cambio de datos la invalida antes)
+LIST_CACHE_TTL = int(os.getenv('LIST_CACHE_TTL', '600'))
+
+# --- Sugerencias de proveedor/categoría: cada cuántos segundos se rearma el índice en memoria
+SUGGEST_INDEX_TTL = int(os.getenv('SUGGEST_INDEX_TTL', '900'))
+
+# --- Admin: segundos que se cachea el total de un changelist; en Postgres, desde cuántas filas
+#     se usa la estimación del planner (pg_class.reltuples) en vez de COUNT(*)
+ADMIN_COUNT_CACHE_TTL = int(os.getenv('ADMIN_COUNT_CACHE_TTL', '60'))
+ADMIN_ESTIMATED_COUNT_MIN = int(os.getenv('ADMIN_ESTIMATED_COUNT_MIN', '100000'))
+
+# --- Instrumentación por request: header Server-Timing + línea de log (ver expenses/timing.py)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False').lower() == 'true'
+
+# --- Logging: los logs de la app (p.ej. hits/misses del cache de exports) van a stdout
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'expenses': {'handlers': ['console'], 'level': os.getenv('EXPENSES_LOG_LEVEL', 'INFO')},
+    },
+}
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
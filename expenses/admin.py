@@ -1,5 +1,87 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Expense, Receipt, Project
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from . import search, suggest
+from .models import Expense, Receipt, Project, ExportJob, ExpenseRollup, DeltaExport
+
+
+# ---------- Changelist rápido con muchos gastos ----------
+class CachedCountPaginator(Paginator):
+    """
+    COUNT(*) del changelist cacheado ADMIN_COUNT_CACHE_TTL segundos por consulta.
+    En Postgres, sin filtros y con tabla grande, usa la estimación de pg_class.
+    """
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if connection.vendor == 'postgresql' and not qs.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                               [qs.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_ESTIMATED_COUNT_MIN:
+                return row[0]
+        try:
+            key = 'expenses:admin-count:' + hashlib.sha256(str(qs.query).encode()).hexdigest()
+        except Exception:
+            return qs.count()  # consulta vacía o que no se puede imprimir: contamos directo
+        n = cache.get(key)
+        if n is None:
+            n = qs.count()
+            cache.set(key, n, settings.ADMIN_COUNT_CACHE_TTL)
+        return n
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Filtro por FK sin listar toda la tabla: muestra lo elegido y un buscador que
+    usa el autocomplete del admin (search_fields del admin de destino).
+    """
+    template = 'admin/expenses/autocomplete_filter.html'
+
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        remote = field.remote_field.model._default_manager.filter(pk__in=self.lookup_val)
+        return [(obj.pk, str(obj)) for obj in remote]
+
+    def has_output(self):
+        return True
+
+    def autocomplete_url(self):
+        return reverse('admin:autocomplete') + '?' + urlencode({
+            'app_label': self.field.model._meta.app_label,
+            'model_name': self.field.model._meta.model_name,
+            'field_name': self.field.name,
+        })
+
+
+class TopCategoryFilter(admin.SimpleListFilter):
+    """Categorías más usadas (del índice de sugerencias en memoria, sin DISTINCT sobre la tabla)."""
+    title = 'categoría'
+    parameter_name = 'category'
+    TOP = 20
+
+    def lookups(self, request, model_admin):
+        top = suggest.get_index('category').search('', limit=self.TOP)
+        if self.value() and self.value() not in top:
+            top.append(self.value())
+        return [(value, value) for value in top]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category=self.value())
+        return queryset
 
 
 class ReceiptInline(admin.TabularInline):
@@ -23,25 +105,69 @@ class ExpenseAdmin(admin.ModelAdmin):
         "id", "date", "vendor", "category", "amount",
         "payment_method", "project", "created_by", "created_at", "receipts_count",
     )
-    search_fields = (
-        "vendor", "description", "project_code", "category",
-        "created_by__username", "project__name", "project__code",
+    # La búsqueda va por el índice full-text (ver get_search_results), no icontains sobre joins
+    search_fields = ("vendor", "description", "notes")
+    search_help_text = "Proveedor, descripción o notas (cada palabra como prefijo). #123 busca por ID."
+    list_filter = (
+        "payment_method", TopCategoryFilter, "date",
+        ("project", AutocompleteFilter), ("created_by", AutocompleteFilter),
     )
-    list_filter = ("payment_method", "category", "date", "project", "created_by")
-    date_hierarchy = "date"
     ordering = ("-date", "-id")
     readonly_fields = ("created_at",)
     inlines = [ReceiptInline]
     list_select_related = ("project", "created_by")
+    autocomplete_fields = ("project", "created_by")
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # Subconsulta por fila mostrada (no un GROUP BY de toda la tabla, ni una query por fila)
+        receipts = (
+            Receipt.objects.filter(expense=OuterRef('pk')).order_by()
+            .values('expense').annotate(n=Count('id')).values('n')
+        )
+        return qs.annotate(receipts_total=Coalesce(Subquery(receipts), 0))
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.startswith('#') and term[1:].isdigit():
+            return queryset.filter(pk=int(term[1:])), False
+        return search.filter_queryset(queryset, term), False
 
     @admin.display(description="Recibos")
     def receipts_count(self, obj):
-        return obj.receipts.count()
+        return obj.receipts_total
 
 
 @admin.register(Receipt)
 class ReceiptAdmin(admin.ModelAdmin):
     list_display = ("id", "expense", "image", "original_name", "uploaded_at")
-    search_fields = ("original_name", "expense__vendor")
+    search_fields = ("original_name", "=expense__id")
     list_filter = ("uploaded_at",)
     readonly_fields = ("uploaded_at",)
+    list_select_related = ("expense",)
+    autocomplete_fields = ("expense",)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "created_by", "status", "rows_done", "receipts_done", "created_at", "expires_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "started_at", "finished_at")
+
+
+@admin.register(DeltaExport)
+class DeltaExportAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "query", "expenses_count", "receipts_count", "created_at")
+    list_select_related = ("user",)
+    readonly_fields = ("created_at",)
+
+
+@admin.register(ExpenseRollup)
+class ExpenseRollupAdmin(admin.ModelAdmin):
+    list_display = ("period", "project", "user", "category", "total", "count")
+    list_filter = ("period",)
+    list_select_related = ("project", "user")
@@ -0,0 +1,76 @@
+# expenses/aio.py
+"""
+Piezas del camino async (ASGI, ASYNC_VIEWS=True; ver async_views.py).
+
+El I/O de storage (leer/escribir recibos, partes del ZIP) va a un único pool
+de threads por proceso, acotado a ASYNC_IO_WORKERS: muchas descargas o
+subidas lentas esperan en el event loop sin ocupar un worker cada una, y el
+disco/S3 no recibe más pedidos en paralelo que ese tope.
+
+Lo que toca la BD no va a ese pool: corre con sync_to_async en el thread del
+request (mismo thread y misma conexión durante todo el stream).
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def executor():
+    """Pool compartido para I/O de storage (se crea la primera vez)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_IO_WORKERS,
+                                               thread_name_prefix='storage-io')
+    return _executor
+
+
+async def run_io(func, *args, **kwargs):
+    """func(*args, **kwargs) en el pool de storage, sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(func, *args, **kwargs))
+
+
+async def iterate_io(iterator):
+    """Iterador sync de bytes que solo lee archivos → async (cada next() en el pool de storage)."""
+    iterator = iter(iterator)
+    try:
+        while (chunk := await run_io(next, iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            await run_io(close)
+
+
+async def iterate_db(iterator):
+    """Iterador sync que consulta la BD (export) → async, en el thread sync del request."""
+    iterator = iter(iterator)
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await step(iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+async def read_file(f, chunk_size=CHUNK_SIZE):
+    """Bloques de un archivo abierto, leídos en el pool de storage; lo cierra al final."""
+    try:
+        while chunk := await run_io(f.read, chunk_size):
+            yield chunk
+    finally:
+        await run_io(f.close)
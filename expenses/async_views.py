@@ -0,0 +1,146 @@
+# expenses/async_views.py
+"""
+Versiones async (ASGI) de las vistas con I/O largo: carga de gasto con
+recibos, export ZIP y entrega de recibos. Con ASYNC_VIEWS=True urls.py usa
+estas en lugar de las sync; permisos, filtros y respuestas son los mismos.
+El resto de las vistas que responden en streaming se envuelven con
+async_streaming, así ninguna queda armada entera en memoria.
+
+Un request esperando al disco o a un cliente lento no ocupa un worker: los
+archivos se leen/escriben en el pool acotado de aio.py y la BD se usa con
+sync_to_async (ver aio.py para el porqué de cada lado).
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from . import aio, export_cache, serving
+from .deletion import discard_stored_files
+from .filters import export_filename
+from .forms import ExpenseForm, ReceiptForm
+from .images import process_uploads
+from .models import Receipt
+from .roles import is_manager
+from .utils import build_export
+from .views import _filtered_queryset, receipt_file_name
+
+
+def alogin_required(view):
+    """login_required para vistas async (el de Django 5.0 solo envuelve vistas sync)."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_streaming(view):
+    """
+    Vista sync que responde en streaming (CSV/Parquet/Arrow, ZIP en partes,
+    novedades, descarga de jobs) → async. Bajo ASGI Django junta en memoria
+    todo el cuerpo de una respuesta con iterador sync; así cada bloque se pide
+    por separado: los generadores que consultan la BD en el thread del request
+    y los archivos en el pool de storage.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await sync_to_async(view)(request, *args, **kwargs)
+        if response.streaming and not response.is_async:
+            iterate = aio.iterate_io if isinstance(response, FileResponse) else aio.iterate_db
+            response.streaming_content = iterate(response.streaming_content)
+        return response
+    return wrapper
+
+
+# --- Crear gasto ---
+@method_decorator(alogin_required, name='dispatch')
+class ExpenseCreateView(View):
+    template_name = 'expenses/expense_form.html'
+
+    async def get(self, request):
+        # render en thread: los context processors consultan la BD (roles)
+        return await sync_to_async(render)(request, self.template_name, {
+            'form': ExpenseForm(),
+            'rform': ReceiptForm(),
+        })
+
+    async def post(self, request):
+        user = await request.auser()
+        # El multipart ya está en memoria/disco temporal: parsearlo y leerlo no bloquea el loop
+        files = await aio.run_io(lambda: request.FILES.getlist('image'))
+        form = ExpenseForm(request.POST)
+
+        if not await sync_to_async(form.is_valid)():
+            messages.error(request, 'Revisá los campos.')
+            return await sync_to_async(render)(request, self.template_name, {'form': form, 'rform': ReceiptForm()})
+
+        # Orientación, tope de resolución, re-encode y miniatura (ver images.py), y subida al storage
+        items = await aio.run_io(lambda: [(f.name, f.read()) for f in files])
+        processed = await aio.run_io(process_uploads, items)
+        receipts = [
+            Receipt(image=image, thumbnail=thumb or '', processed=thumb is not None, original_name=f.name)
+            for f, (image, thumb) in zip(files, processed)
+        ]
+        try:
+            # Se espera a todas las subidas (aunque una falle) para saber qué quedó en el storage
+            results = await asyncio.gather(*(aio.run_io(r.store_files) for r in receipts), return_exceptions=True)
+            for error in results:
+                if isinstance(error, BaseException):
+                    raise error
+            await sync_to_async(_save_expense)(form, user, receipts)
+        except Exception:
+            # Gasto no guardado: los archivos ya subidos se encolan para borrar (ver deletion.py)
+            await sync_to_async(discard_stored_files)(receipts)
+            raise
+
+        messages.success(request, 'Gasto cargado correctamente. Podés cargar otro.')
+        return redirect(reverse('expense-create'))
+
+
+def _save_expense(form, user, receipts):
+    with transaction.atomic():
+        expense = form.save(commit=False)
+        expense.created_by = user
+        expense.save()
+        for r in receipts:
+            r.expense = expense
+            r.save()   # archivos ya guardados: solo la fila (y los signals)
+
+
+# --- Export ZIP ---
+def _prepare_export(request):
+    qs, form = _filtered_queryset(request)
+    key = export_cache.cache_key(form, request.user, is_manager(request.user), qs)
+    return qs, export_filename(form, request.user), key, export_cache.get(key)
+
+
+@alogin_required
+async def export_zip(request):
+    qs, fname, key, cached = await sync_to_async(_prepare_export)(request)
+    if cached:
+        content = aio.read_file(cached)
+    else:
+        # El ZIP se arma en el thread del request (BD); los recibos se leen en el pool compartido
+        content = aio.iterate_db(export_cache.store(key, build_export(qs, executor=aio.executor())))
+    resp = StreamingHttpResponse(content, content_type='application/zip')
+    resp['Content-Disposition'] = f'attachment; filename="{fname}"'
+    return resp
+
+
+# --- Archivos de recibos ---
+@alogin_required
+async def receipt_file(request, pk, variant='image'):
+    name, filename = await sync_to_async(receipt_file_name)(request, pk, variant)
+    storage = Receipt._meta.get_field('image').storage
+    return await serving.aserve(request, storage, name, filename)
@@ -0,0 +1,105 @@
+# expenses/blobs.py
+"""
+Almacenamiento por contenido de los archivos de recibos: el nombre en storage
+es el SHA-256 de los bytes (receipts/blobs/ab/abcd….jpg), así la misma foto
+subida dos veces (o adjunta a varios gastos) se guarda una sola vez.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+BLOB_PREFIX = 'receipts/blobs'
+THUMB_PREFIX = 'receipts/thumbs'
+
+
+def file_digest(content):
+    """SHA-256 (hex) de un File/ContentFile, leído por bloques."""
+    h = hashlib.sha256()
+    for chunk in content.chunks():
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_name(digest, ext, prefix=BLOB_PREFIX):
+    return f"{prefix}/{digest[:2]}/{digest}{ext}"
+
+
+def is_blob_name(name, prefix=BLOB_PREFIX):
+    """True si `name` ya está en el layout por contenido (prefix/ab/<sha256>.ext)."""
+    if not name.startswith(f"{prefix}/"):
+        return False
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return len(stem) == 64 and all(c in '0123456789abcdef' for c in stem)
+
+
+def store_blob(storage, content, prefix=BLOB_PREFIX):
+    """
+    Guarda `content` en su nombre por contenido (si no estaba ya) y devuelve
+    (nombre en storage, digest). Si ya estaba se le renueva la fecha: el GC no
+    borra blobs tocados hace menos de BLOB_GC_GRACE_MINUTES, así no se lleva uno
+    que esta subida está por referenciar (ver delete_unreferenced).
+    """
+    digest = file_digest(content)
+    ext = os.path.splitext(content.name or '')[1].lower() or '.bin'
+    name = blob_name(digest, ext, prefix)
+    if storage.exists(name):
+        try:
+            os.utime(storage.path(name))
+            return name, digest
+        except NotImplementedError:
+            pass  # storage remoto (sin path): se vuelve a subir, lo que renueva su fecha
+        except FileNotFoundError:
+            pass  # el GC lo borró recién: se vuelve a guardar
+    content.seek(0)
+    name = storage.save(name, content)
+    return name, digest
+
+
+def _referenced(name):
+    from django.db.models import Q
+    from .models import Receipt
+
+    return Receipt.objects.filter(Q(image=name) | Q(thumbnail=name)).exists()
+
+
+def recently_stored(storage, name, grace=None):
+    """True si `name` se guardó o se reusó hace menos de `grace` minutos (BLOB_GC_GRACE_MINUTES)."""
+    if grace is None:
+        grace = settings.BLOB_GC_GRACE_MINUTES
+    cutoff = timezone.now() - timedelta(minutes=grace)
+    try:
+        return storage.get_modified_time(name) > cutoff
+    except (OSError, NotImplementedError):
+        return False
+
+
+def delete_unreferenced(storage, name, grace=None):
+    """
+    Borra `name` si ningún Receipt lo usa y no se tocó dentro del margen de
+    gracia. Las referencias se vuelven a mirar justo antes de borrar: una
+    subida que reusa el blob renueva su fecha antes de crear su fila, así que
+    o la vemos acá o cae dentro del margen. Devuelve None si hay que esperar.
+    """
+    if recently_stored(storage, name, grace):
+        return None
+    if _referenced(name):
+        return False
+    storage.delete(name)
+    return True
+
+
+def delete_if_unreferenced(storage, name):
+    """Borra `name` del storage solo si ningún Receipt lo sigue usando (blobs compartidos).
+    Si se usó hace poco, queda encolado en PendingFileDeletion para el worker."""
+    from .models import PendingFileDeletion
+
+    if not name:
+        return False
+    deleted = delete_unreferenced(storage, name)
+    if deleted is None:
+        PendingFileDeletion.objects.create(name=name)
+        return False
+    return deleted
@@ -0,0 +1,146 @@
+# expenses/choices.py
+"""
+Opciones de obra/usuario para los filtros, cacheadas y versionadas.
+
+La lista (pk, etiqueta) vive en el cache de Django bajo una clave con versión;
+guardar o borrar un Project/User cambia la versión y la próxima vista la
+rearma. El cache es el compartido entre procesos (ver CACHES en settings): una
+obra creada desde el admin de otro worker o desde un comando aparece enseguida
+en todos. Solo se lee al renderizar el <select>: el export y el worker validan
+el valor elegido con un único get() y no tocan la lista.
+
+Si hay más de FILTER_CHOICES_LIMIT filas no se manda la lista: el <select>
+lleva solo la opción elegida y el navegador busca en /autocomplete/<tipo>/.
+"""
+import time
+
+from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.choices import BaseChoiceIterator
+
+from .models import Project
+
+AUTOCOMPLETE_RESULTS = 20
+
+
+def _project_label(code, name):
+    return code or name   # igual que Project.__str__
+
+
+# tipo → (queryset ordenado, campos, etiqueta, filtro de búsqueda)
+SOURCES = {
+    'projects': (
+        lambda: Project.objects.order_by('code', 'name'), ('pk', 'code', 'name'), _project_label,
+        lambda q: Q(code__istartswith=q) | Q(name__icontains=q),
+    ),
+    'users': (
+        lambda: User.objects.order_by('username'), ('pk', 'username'), lambda username: username,
+        lambda q: Q(username__istartswith=q),
+    ),
+}
+
+
+def _version_key(kind):
+    return f"expenses:choices:{kind}:version"
+
+
+def invalidate(kind):
+    cache.set(_version_key(kind), time.time_ns(), None)
+
+
+def get_choices(kind):
+    """{'count': n, 'items': [(pk, etiqueta), …] o None si son demasiadas (modo autocomplete)}."""
+    version = cache.get_or_set(_version_key(kind), time.time_ns, None)
+    key = f"expenses:choices:{kind}:{version}"
+    data = cache.get(key)
+    if data is None:
+        queryset, fields, label, _ = SOURCES[kind]
+        limit = settings.FILTER_CHOICES_LIMIT
+        rows = list(queryset().values_list(*fields)[:limit + 1])
+        items = [(row[0], label(*row[1:])) for row in rows]
+        data = {'count': len(items), 'items': items if len(items) <= limit else None}
+        cache.set(key, data, settings.FILTER_CHOICES_TTL)
+    return data
+
+
+def search(kind, term):
+    """Primeras AUTOCOMPLETE_RESULTS coincidencias para el endpoint de autocomplete."""
+    queryset, fields, label, match = SOURCES[kind]
+    qs = queryset().filter(match(term)) if term else queryset()
+    return [
+        {'id': row[0], 'text': label(*row[1:])}
+        for row in qs.values_list(*fields)[:AUTOCOMPLETE_RESULTS]
+    ]
+
+
+class _CachedChoices(BaseChoiceIterator):
+    """choices del widget (perezosas): la lista cacheada o, si es muy larga, solo lo elegido."""
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        items = get_choices(self.field.kind)['items']
+        if items is not None:
+            yield from items
+        elif self.field.selected is not None:
+            yield (self.field.selected.pk, str(self.field.selected))
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+class AutocompleteSelect(forms.Select):
+    """<select> que, con demasiadas opciones, avisa al JS dónde buscar."""
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        if get_choices(self.kind)['items'] is None:
+            context['widget']['attrs']['data-autocomplete-url'] = reverse('autocomplete', args=[self.kind])
+        return context
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField que valida solo el valor elegido (un get() por pk) y
+    renderiza las opciones desde el cache en vez de recorrer el queryset.
+    """
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        self.selected = None
+        kwargs.setdefault('widget', AutocompleteSelect(kind, attrs={'class': 'form-select'}))
+        super().__init__(SOURCES[kind][0](), **kwargs)
+
+    def _get_choices(self):
+        return _CachedChoices(self)
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+    def to_python(self, value):
+        self.selected = super().to_python(value)
+        return self.selected
+
+
+# --- Invalidación ---
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def _projects_changed(sender, **kwargs):
+    invalidate('projects')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _users_changed(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # cada login guarda last_login: no cambia la lista
+    invalidate('users')
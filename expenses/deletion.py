@@ -0,0 +1,85 @@
+# expenses/deletion.py
+"""
+Borrado masivo por lotes de gastos y limpieza diferida de archivos.
+
+Cada lote de ids se borra en su propia transacción corta (no un DELETE gigante
+que bloquea la tabla) y con memoria acotada al lote. Los archivos de los
+recibos no se borran en el request: se encolan en PendingFileDeletion y los
+borra el worker, solo si ningún otro recibo los usa (blobs compartidos) y no
+se reusaron dentro del margen de gracia (BLOB_GC_GRACE_MINUTES).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import list_cache, rollups
+from .blobs import delete_unreferenced
+from .models import Expense, Receipt, PendingFileDeletion
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 500
+CLEANUP_BATCH_SIZE = 200
+
+
+def delete_expenses(expenses_qs, batch_size=DELETE_BATCH_SIZE):
+    """Borra los gastos de `expenses_qs` (y sus recibos) por lotes. Devuelve cuántos borró."""
+    ids_qs = expenses_qs.select_related(None).prefetch_related(None).order_by('id')
+    deleted, last_id = 0, 0
+    while True:
+        ids = list(ids_qs.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        last_id = ids[-1]
+
+        with transaction.atomic(), rollups.suspended():
+            chunk = Expense.objects.filter(id__in=ids)
+            receipts = Receipt.objects.filter(expense_id__in=ids)
+            names = {name for pair in receipts.values_list('image', 'thumbnail') for name in pair if name}
+            PendingFileDeletion.objects.bulk_create([PendingFileDeletion(name=n) for n in names])
+            # Rollups: un delta por clave del lote
+            rollups.subtract_queryset(chunk)
+            owners = set(chunk.values_list('created_by_id', flat=True))
+            deleted += chunk.delete()[1].get(Expense._meta.label, 0)  # cascada a recibos
+        list_cache.bump(owners)
+
+
+def discard_stored_files(receipts):
+    """Recibos cuyos archivos ya se subieron pero la fila no se guardó: se encolan para borrar."""
+    names = {f.name for r in receipts for f in (r.image, r.thumbnail) if f and f._committed}
+    PendingFileDeletion.objects.bulk_create([PendingFileDeletion(name=n) for n in names])
+
+
+def process_pending_files(storage=None, batch_size=CLEANUP_BATCH_SIZE, grace=None):
+    """
+    Borra del storage los archivos encolados que ya no usa ningún recibo. Los
+    tocados hace menos de `grace` minutos (un upload que reusa el blob) quedan
+    en la cola para la próxima pasada (ver blobs.delete_unreferenced).
+    """
+    storage = storage or Receipt._meta.get_field('image').storage
+    removed, last_id = 0, 0
+    while True:
+        batch = list(PendingFileDeletion.objects.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return removed
+        last_id = batch[-1].pk
+        names = {p.name for p in batch}
+        in_use = set(
+            name
+            for pair in Receipt.objects.filter(Q(image__in=names) | Q(thumbnail__in=names))
+            .values_list('image', 'thumbnail')
+            for name in pair
+        )
+        waiting = set()
+        for name in names - in_use:
+            try:
+                deleted = delete_unreferenced(storage, name, grace)
+            except OSError:
+                logger.exception("no se pudo borrar %s del storage", name)
+                continue
+            if deleted is None:
+                waiting.add(name)
+            elif deleted:
+                removed += 1
+        PendingFileDeletion.objects.filter(pk__in=[p.pk for p in batch if p.name not in waiting]).delete()
@@ -0,0 +1,124 @@
+# expenses/delta.py
+"""
+Exports incrementales ("novedades desde el último export").
+
+Por usuario + filtro (mismo hash que el cache de exports) se guarda una marca
+de agua: el último gasto exportado en orden (created_at, id) y el último
+recibo en orden (uploaded_at, id). Cada export delta trae:
+- en el Excel, los gastos cargados después de la marca;
+- en receipts/, sus recibos y los recibos nuevos de gastos ya exportados;
+- manifest.json con el rango de marcas y qué gastos/recibos se agregaron.
+
+El tope del export se fija al empezar (lo que entra mientras se arma va en el
+siguiente) y la marca nueva solo se graba si el ZIP se generó entero. Con
+`repetir` se vuelve a generar el último rango (descarga que falló).
+
+El tope queda DELTA_EXPORT_MARGIN_SECONDS antes del momento del export: una
+transacción que todavía no commiteó (un import largo) tiene created_at/id
+anteriores a filas ya visibles, y si la marca pasara por encima de ellas no
+entrarían nunca. Lo cargado dentro de ese margen va en el próximo export.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import export_cache
+from .models import DeltaExport, Receipt
+from .utils import build_export
+
+
+def filter_key(form, user, manager):
+    payload = json.dumps({
+        'filters': export_cache.normalized_filters(form),
+        'scope': export_cache.visibility_scope(user, manager),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _after(time_field, since, last_id):
+    """(time_field, id) > (since, last_id); sin marca, todo."""
+    if since is None:
+        return Q()
+    return Q(**{f"{time_field}__gt": since}) | Q(**{time_field: since, 'id__gt': last_id})
+
+
+def _until(time_field, until, last_id):
+    """(time_field, id) <= (until, last_id); sin tope (no había filas), nada."""
+    if until is None:
+        return Q(pk__in=[])
+    return Q(**{f"{time_field}__lt": until}) | Q(**{time_field: until, 'id__lte': last_id})
+
+
+def _latest(qs, time_field, cutoff):
+    qs = qs.filter(**{f"{time_field}__lte": cutoff})
+    return qs.order_by(f"-{time_field}", '-id').values_list(time_field, 'id').first() or (None, 0)
+
+
+def marks(user, key, repeat=False):
+    """(desde, hasta) como DeltaExport (o None): desde es la última marca; con repeat, el rango anterior."""
+    recent = list(DeltaExport.objects.filter(user=user, filter_key=key).order_by('-id')[:2])
+    if repeat:
+        if not recent:
+            return None, None
+        return (recent[1] if len(recent) > 1 else None), recent[0]
+    return (recent[0] if recent else None), None
+
+
+def build(expenses_qs, form, user, manager, query='', repeat=False):
+    """
+    Iterador de bytes del ZIP delta. Al terminar de generarlo (y si no es una
+    repetición) graba la nueva marca de agua.
+    """
+    key = filter_key(form, user, manager)
+    since, until = marks(user, key, repeat)
+    expenses_qs = expenses_qs.select_related(None).prefetch_related(None)
+    receipts_qs = Receipt.objects.filter(expense__in=expenses_qs.values('id'))
+
+    if until is None:
+        # Tope fijo al arrancar: lo que se cargue mientras se arma entra en el próximo
+        # … y con margen: filas de transacciones que aún no commitearon no quedan detrás de la marca
+        cutoff = timezone.now() - timedelta(seconds=settings.DELTA_EXPORT_MARGIN_SECONDS)
+        until = DeltaExport(user=user, filter_key=key, query=query[:500])
+        until.expenses_until, until.last_expense_id = _latest(expenses_qs, 'created_at', cutoff)
+        until.receipts_until, until.last_receipt_id = _latest(receipts_qs, 'uploaded_at', cutoff)
+
+    new_expenses = expenses_qs.filter(
+        _after('created_at', since and since.expenses_until, since and since.last_expense_id),
+        _until('created_at', until.expenses_until, until.last_expense_id),
+    )
+    # Recibos nuevos de gastos ya exportados antes (los de gastos nuevos vienen con el Excel)
+    old_expenses = expenses_qs.exclude(pk__in=new_expenses.values('id'))
+    new_receipts = Receipt.objects.filter(
+        _after('uploaded_at', since and since.receipts_until, since and since.last_receipt_id),
+        _until('uploaded_at', until.receipts_until, until.last_receipt_id),
+        expense__in=old_expenses.values('id'),
+    )
+
+    manifest = {
+        'type': 'delta',
+        'generated_at': timezone.now().isoformat(),
+        'filters': export_cache.normalized_filters(form),
+        'from': _mark_dict(since),
+        'to': _mark_dict(until),
+        'expenses': [],
+        'receipts': [],
+    }
+    yield from build_export(new_expenses, extra_receipts=new_receipts, manifest=manifest)
+
+    if until.pk is None:
+        until.expenses_count = len(manifest['expenses'])
+        until.receipts_count = len(manifest['receipts'])
+        until.save()
+
+
+def _mark_dict(mark):
+    if mark is None:
+        return None
+    return {
+        'expenses': [mark.expenses_until, mark.last_expense_id],
+        'receipts': [mark.receipts_until, mark.last_receipt_id],
+    }
@@ -0,0 +1,152 @@
+# expenses/export_cache.py
+"""
+Cache en disco de ZIPs ya armados.
+
+La clave es un hash de: filtros normalizados + alcance de visibilidad del
+usuario + versión de datos de los gastos que matchean. Si alguno de esos
+gastos (o sus recibos) cambia, cambia la versión y el ZIP viejo deja de
+usarse; el desalojo es LRU por tamaño total (EXPORT_CACHE_MAX_MB).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+
+logger = logging.getLogger(__name__)
+
+# Subirlo cuando cambie el formato del ZIP/Excel, así se ignora lo cacheado antes
+EXPORT_FORMAT_VERSION = 1
+
+
+def _cache_dir():
+    path = Path(settings.EXPORT_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def normalized_filters(form):
+    """Valores del ExpenseFilterForm en forma estable (ids y fechas ISO)."""
+    if not form.is_valid():
+        return {}
+    data = {}
+    for name, value in form.cleaned_data.items():
+        if value in (None, ''):
+            continue
+        data[name] = value.pk if hasattr(value, 'pk') else (
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        )
+    return data
+
+
+def visibility_scope(user, manager):
+    """Los managers ven todo; un operador solo lo propio."""
+    return 'all' if manager else f"user:{user.pk}"
+
+
+def data_version(expenses_qs):
+    """
+    Sello barato de los datos que matchean: cantidad, suma de ids y último
+    updated_at. Cambia con altas, bajas y ediciones (de gastos o recibos).
+    """
+    stamp = (
+        expenses_qs.select_related(None).prefetch_related(None).order_by()
+        .aggregate(n=Count('id'), ids=Sum('id'), last=Max('updated_at'))
+    )
+    last = stamp['last'].isoformat() if stamp['last'] else ''
+    return f"{stamp['n']}:{stamp['ids'] or 0}:{last}"
+
+
+def cache_key(form, user, manager, expenses_qs, part=None):
+    payload = json.dumps({
+        'v': EXPORT_FORMAT_VERSION,
+        'part': part,  # export en partes: (por, grupo, desde, hasta)
+        'filters': normalized_filters(form),
+        'scope': visibility_scope(user, manager),
+        'data': data_version(expenses_qs),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key):
+    """ZIP cacheado ya abierto (y marcado como usado recién) o None.
+
+    Se abre acá y no se devuelve la ruta: evict() u otro proceso pueden borrar
+    el archivo en cualquier momento; abierto, se sigue leyendo entero igual.
+    """
+    path = _cache_dir() / f"{key}.zip"
+    try:
+        f = open(path, 'rb')
+        os.utime(f.fileno())  # LRU: el mtime es el último uso
+        size = os.fstat(f.fileno()).st_size
+    except OSError:
+        logger.info("export cache MISS %s", key[:12])
+        return None
+    logger.info("export cache HIT %s (%d bytes)", key[:12], size)
+    return f
+
+
+def store(key, chunks):
+    """
+    Deja pasar los bytes de `chunks` (para el streaming) y a la vez los escribe
+    al cache. Solo se publica el archivo si el ZIP se completó entero y entra
+    en EXPORT_CACHE_MAX_MB (uno más grande vaciaría el cache entero).
+    """
+    directory = _cache_dir()
+    final = directory / f"{key}.zip"
+    limit = settings.EXPORT_CACHE_MAX_MB * 1024 * 1024
+    # Nombre único por escritura: dos exports iguales a la vez (threads, doble click,
+    # camino async) no comparten el temporal; el último os.replace gana entero
+    fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix='.part', dir=directory)
+    tmp = Path(tmp)
+    out = os.fdopen(fd, 'wb')
+    written = 0
+    completed = False
+    try:
+        for chunk in chunks:
+            if out is not None:
+                written += len(chunk)
+                if written > limit:
+                    # Demasiado grande para el cache: se sigue mandando sin guardarlo
+                    out.close()
+                    out = None
+                    tmp.unlink(missing_ok=True)
+                    logger.info("export cache SKIP %s (más de %d MB)", key[:12], settings.EXPORT_CACHE_MAX_MB)
+                else:
+                    out.write(chunk)
+            yield chunk
+        if out is not None:
+            out.close()
+            os.replace(tmp, final)
+            completed = True
+            logger.info("export cache STORE %s (%d bytes)", key[:12], written)
+            evict()
+    finally:
+        if out is not None and not out.closed:
+            out.close()
+        if not completed:
+            tmp.unlink(missing_ok=True)
+
+
+def evict(max_bytes=None):
+    """Borra los ZIPs menos usados hasta quedar bajo el límite de tamaño."""
+    if max_bytes is None:
+        max_bytes = settings.EXPORT_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    for path in _cache_dir().glob('*.zip'):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.info("export cache EVICT %s (%d bytes)", path.stem[:12], size)
@@ -0,0 +1,79 @@
+# expenses/filters.py
+"""
+Filtro de gastos con permisos y nombre de archivo de los exports.
+
+Sin dependencias de request ni de vistas: lo usan las vistas (sync y async)
+y el worker de ExportJob (jobs.py).
+"""
+from . import search
+from .forms import ExpenseFilterForm
+from .models import Expense
+from .roles import is_manager
+
+
+def filter_expenses(data, user):
+    """
+    Filtros de la lista sin request: recibe los datos del filtro
+    (QueryDict/dict o None) y el usuario. Lo usa también el worker de
+    ExportJob.
+    """
+    qs = (
+        Expense.objects
+        .select_related('project', 'created_by')
+        .prefetch_related('receipts')
+        .order_by('-date', '-id')
+    )
+
+    form = ExpenseFilterForm(data, user=user)
+
+    if form.is_valid():
+        start = form.cleaned_data.get('start')
+        end = form.cleaned_data.get('end')
+        project = form.cleaned_data.get('project')
+        user_obj = form.cleaned_data.get('user')
+
+        if start:
+            qs = qs.filter(date__gte=start)
+        if end:
+            qs = qs.filter(date__lte=end)
+        if project:
+            qs = qs.filter(project=project)
+        if form.cleaned_data.get('q'):
+            qs = search.filter_queryset(qs, form.cleaned_data['q'])
+
+        if is_manager(user):
+            if user_obj:
+                qs = qs.filter(created_by=user_obj)
+        else:
+            if user.is_authenticated:
+                qs = qs.filter(created_by=user)
+            else:
+                qs = qs.none()
+    else:
+        # Sin form válido, aplicamos visibilidad básica
+        if user.is_authenticated and not is_manager(user):
+            qs = qs.filter(created_by=user)
+        elif not user.is_authenticated:
+            qs = qs.none()
+
+    return qs, form
+
+
+def export_filename(form, user, ext='zip', suffix=''):
+    """Nombre de archivo amigable para el export: usuario / periodo."""
+    who = "ALL"
+    if is_manager(user):
+        u = form.cleaned_data.get('user') if form.is_valid() else None
+        if u:
+            who = u.username
+    elif user.is_authenticated:
+        who = user.username
+
+    start = form.cleaned_data.get('start') if form.is_valid() else None
+    end = form.cleaned_data.get('end') if form.is_valid() else None
+    since = start.isoformat() if start else ''
+    until = end.isoformat() if end else ''
+    period = f"{since}_to_{until}".strip('_') or 'all'
+
+    name = f"absl-expenses-{who}-{period}{suffix}.{ext}"
+    return name.replace('..', '.')
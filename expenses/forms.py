@@ -1,7 +1,9 @@
 # expenses/forms.py
 from django import forms
-from django.contrib.auth.models import User
-from .models import Expense, Receipt, Project
+from django.urls import reverse_lazy
+from .models import Expense, Receipt
+from .roles import is_manager
+from .choices import CachedModelChoiceField
 
 
 # ---------- Formulario de carga ----------
@@ -15,8 +17,11 @@ class ExpenseForm(forms.ModelForm):
         ]
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-            'category': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: Combustible, Materiales'}),
-            'vendor': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Proveedor'}),
+            # data-suggest-url: el JS agrega sugerencias (ver suggest.py)
+            'category': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: Combustible, Materiales',
+                                               'data-suggest-url': reverse_lazy('autocomplete', args=['category'])}),
+            'vendor': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Proveedor',
+                                             'data-suggest-url': reverse_lazy('autocomplete', args=['vendor'])}),
             'description': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Detalle'}),
             'amount': forms.NumberInput(attrs={'step': '0.01', 'class': 'form-control'}),
             'payment_method': forms.Select(attrs={'class': 'form-select'}),
@@ -27,10 +32,40 @@ class ExpenseForm(forms.ModelForm):
 
     # Validación simple
     def clean_amount(self):
-        amount = self.cleaned_data.get('amount')
-        if amount is None or amount <= 0:
-            raise forms.ValidationError("El monto debe ser mayor que 0.")
-        return amount
+        return validate_amount(self.cleaned_data.get('amount'))
+
+
+def validate_amount(amount):
+    """Regla de monto compartida por ExpenseForm y el import masivo."""
+    if amount is None or amount <= 0:
+        raise forms.ValidationError("El monto debe ser mayor que 0.")
+    return amount
+
+
+# ---------- Carga por lote (varias filas en un solo envío) ----------
+class ExpenseBatchForm(ExpenseForm):
+    """
+    Fila del alta por lote. La obra se elige y valida contra un mapa de obras
+    compartido por todo el formset (una consulta en total, no una por fila).
+    """
+    project = forms.TypedChoiceField(
+        label='Obra/Proyecto', required=False, coerce=int, empty_value=None,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def __init__(self, *args, projects=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.projects = projects or {}
+        self.fields['project'].choices = [('', '---------')] + [
+            (pk, str(p)) for pk, p in self.projects.items()
+        ]
+
+    def clean_project(self):
+        pk = self.cleaned_data.get('project')
+        return self.projects.get(pk) if pk else None
+
+
+ExpenseBatchFormSet = forms.formset_factory(ExpenseBatchForm, extra=5, max_num=50, absolute_max=50)
 
 
 # ---------- Subida de múltiples recibos ----------
@@ -52,6 +87,12 @@ class ReceiptForm(forms.ModelForm):
 
 # ---------- Filtros de la lista/export ----------
 class ExpenseFilterForm(forms.Form):
+    # Texto libre: proveedor, descripción y notas (índice full-text, ver search.py)
+    q = forms.CharField(
+        required=False, max_length=200,
+        widget=forms.TextInput(attrs={'type': 'search', 'class': 'form-control',
+                                      'placeholder': 'Proveedor, detalle, notas…'})
+    )
     start = forms.DateField(
         required=False,
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
@@ -60,36 +101,17 @@ class ExpenseFilterForm(forms.Form):
         required=False,
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
-    # Usamos queryset="none" y lo seteamos en __init__ para evitar evaluarlo en import-time
-    project = forms.ModelChoiceField(
-        queryset=Project.objects.none(),
-        required=False,
-        widget=forms.Select(attrs={'class': 'form-select'})
-    )
+    # Opciones desde un cache versionado (ver choices.py); solo se valida contra la BD lo elegido
+    project = CachedModelChoiceField('projects', required=False, empty_label="Todas las obras")
     # Visible solo para managers (se controla en __init__)
-    user = forms.ModelChoiceField(
-        queryset=User.objects.none(),
-        required=False,
-        widget=forms.Select(attrs={'class': 'form-select'})
-    )
+    user = CachedModelChoiceField('users', required=False, empty_label="Todos los usuarios")
 
     def __init__(self, *args, **kwargs):
         current_user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
-        # Poblar querysets ordenados (lo hacemos acá para que siempre refleje la BD actual)
-        self.fields['project'].queryset = Project.objects.all().order_by('code', 'name')
-        self.fields['project'].empty_label = "Todas las obras"
-
         # Si es manager mostramos el selector de usuario; si no, lo removemos
-        is_manager = bool(
-            current_user
-            and (current_user.is_superuser or current_user.groups.filter(name__in=['Manager', 'Managers']).exists())
-        )
-        if is_manager:
-            self.fields['user'].queryset = User.objects.all().order_by('username')
-            self.fields['user'].empty_label = "Todos los usuarios"
-        else:
+        if not is_manager(current_user):
             # Ocultar el campo a operadores
             self.fields.pop('user', None)
 
@@ -101,3 +123,17 @@ class ExpenseFilterForm(forms.Form):
         if start and end and start > end:
             self.add_error('end', 'La fecha "Hasta" debe ser posterior o igual a "Desde".')
         return cleaned
+
+
+# ---------- Import masivo (CSV/XLSX) ----------
+class ExpenseImportForm(forms.Form):
+    file = forms.FileField(
+        label='Archivo CSV o XLSX',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+
+    def clean_file(self):
+        f = self.cleaned_data['file']
+        if not f.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Subí un archivo .csv o .xlsx.")
+        return f
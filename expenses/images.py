@@ -0,0 +1,93 @@
+# expenses/images.py
+"""
+Procesamiento de fotos de recibos: orientación EXIF, tope de resolución,
+re-encode a JPEG/WebP liviano y miniatura para la lista.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+# La miniatura es solo para la lista: calidad baja alcanza
+THUMB_QUALITY = 70
+
+_pool = None
+
+
+def _flatten(img):
+    """JPEG no tiene alfa: componemos sobre fondo blanco (tickets escaneados con transparencia)."""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode not in ('RGB', 'L'):
+        return img.convert('RGB')
+    return img
+
+
+def _encode(img, max_side, quality, fmt):
+    img = img.copy()
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = BytesIO()
+    img.save(out, fmt, quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def process_image_bytes(data, max_side, thumb_side, quality, fmt):
+    """
+    Devuelve (imagen, miniatura) como bytes ya re-encodeados, o None si `data`
+    no es una imagen que Pillow pueda abrir (en ese caso se guarda tal cual).
+    Función de módulo para poder correr en un ProcessPoolExecutor.
+    """
+    try:
+        img = Image.open(BytesIO(data))
+        # draft(): el decoder JPEG reduce al leer (mucho más rápido para fotos de 12 MP)
+        img.draft('RGB', (max_side, max_side))
+        img = _flatten(ImageOps.exif_transpose(img))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    return (
+        _encode(img, max_side, quality, fmt),
+        _encode(img, thumb_side, THUMB_QUALITY, fmt),
+    )
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.RECEIPT_PROCESS_WORKERS)
+    return _pool
+
+
+def process_uploads(items):
+    """
+    Procesa una lista de (nombre, bytes) y devuelve, en el mismo orden,
+    (imagen, miniatura) como ContentFile listos para asignar al Receipt.
+    Si no es imagen devuelve el original y miniatura None.
+
+    Con RECEIPT_PROCESS_WORKERS > 0 y más de un archivo usa un pool de procesos.
+    """
+    fmt = settings.RECEIPT_IMAGE_FORMAT
+    args = (settings.RECEIPT_MAX_SIDE, settings.RECEIPT_THUMB_SIDE, settings.RECEIPT_IMAGE_QUALITY, fmt)
+    datas = [data for _, data in items]
+
+    if settings.RECEIPT_PROCESS_WORKERS > 0 and len(items) > 1:
+        results = list(_get_pool().map(process_image_bytes, datas, *[[a] * len(datas) for a in args]))
+    else:
+        results = [process_image_bytes(data, *args) for data in datas]
+
+    out = []
+    for (name, data), result in zip(items, results):
+        if result is None:
+            out.append((ContentFile(data, name=name), None))
+            continue
+        base = os.path.splitext(os.path.basename(name))[0] or 'recibo'
+        ext = EXTENSIONS[fmt]
+        image, thumb = result
+        out.append((ContentFile(image, name=f"{base}.{ext}"), ContentFile(thumb, name=f"{base}.{ext}")))
+    return out
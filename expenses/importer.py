@@ -0,0 +1,181 @@
+# expenses/importer.py
+"""
+Import masivo de gastos desde CSV o XLSX.
+
+Se lee fila por fila (csv.reader / openpyxl read-only), cada fila se valida con
+los mismos campos y reglas que ExpenseForm, las obras se resuelven con un mapa
+en memoria (sin una consulta por fila) y los gastos entran con bulk_create por
+lotes, cada lote en su transacción. Los errores se informan por número de fila.
+"""
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from zipfile import BadZipFile
+
+from django import forms
+from django.conf import settings
+from django.db import transaction
+from django.utils import translation
+from openpyxl import load_workbook
+
+from . import list_cache, rollups, suggest
+from .forms import ExpenseForm, validate_amount
+from .models import Expense, Project
+
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# Encabezado (sin tildes, en minúscula) → campo. Acepta el Excel del export tal cual.
+COLUMNS = {
+    'fecha': 'date', 'date': 'date',
+    'categoria': 'category', 'category': 'category',
+    'proveedor': 'vendor', 'vendor': 'vendor',
+    'descripcion': 'description', 'description': 'description',
+    'monto': 'amount', 'amount': 'amount',
+    'medio de pago': 'payment_method', 'pago': 'payment_method', 'payment_method': 'payment_method',
+    'obra': 'project', 'project': 'project',
+    'codigo/obra': 'project_code', 'codigo/obra (texto)': 'project_code', 'project_code': 'project_code',
+    'notas': 'notes', 'notes': 'notes',
+}
+FORM_FIELDS = ['date', 'category', 'vendor', 'description', 'amount', 'payment_method', 'project_code', 'notes']
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode()
+    return text.strip().lower()
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []   # [(fila, mensaje)], hasta MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def iter_rows(fileobj, filename):
+    """Genera (nro de fila, {campo: valor crudo}) leyendo el archivo en streaming."""
+    if filename.lower().endswith('.xlsx'):
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            yield from _map_rows(rows)
+        finally:
+            wb.close()
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from _map_rows(csv.reader(text, dialect))
+    finally:
+        text.detach()  # no cerramos el archivo del llamador
+
+
+def _map_rows(rows):
+    header = next(rows, None) or []
+    columns = [COLUMNS.get(_normalize(h)) for h in header]
+    if 'amount' not in columns or 'date' not in columns:
+        raise forms.ValidationError("El archivo necesita al menos las columnas Fecha y Monto.")
+    for line, values in enumerate(rows, start=2):
+        if not any(v not in (None, '') for v in values):
+            continue  # fila vacía
+        yield line, {col: v for col, v in zip(columns, values) if col}
+
+
+def _amount(raw):
+    """Acepta 1234.56, 1234,56 y 1.234,56 (formato local)."""
+    if isinstance(raw, str):
+        raw = raw.strip().replace('$', '').replace(' ', '')
+        if ',' in raw:
+            raw = raw.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(str(raw)) if raw not in (None, '') else None
+    except InvalidOperation:
+        raise forms.ValidationError("Monto inválido.")
+
+
+class _RowCleaner:
+    """Valida una fila con los campos de ExpenseForm + mapas en memoria (obras, medios de pago)."""
+    def __init__(self):
+        self.fields = {name: ExpenseForm.base_fields[name] for name in FORM_FIELDS}
+        self.projects = {}
+        for pk, code, name in Project.objects.values_list('pk', 'code', 'name'):
+            self.projects.setdefault(_normalize(name), pk)
+            if code:
+                self.projects[_normalize(code)] = pk
+        self.payments = {}
+        for value, label in Expense.PAYMENT_CHOICES:
+            self.payments[_normalize(value)] = value
+            self.payments[_normalize(label)] = value
+
+    def clean(self, raw):
+        data, errors = {}, []
+        for name, field in self.fields.items():
+            value = raw.get(name)
+            try:
+                if name == 'amount':
+                    value = validate_amount(field.clean(_amount(value)))
+                elif name == 'payment_method':
+                    value = field.clean(self.payments.get(_normalize(value), value or 'other'))
+                else:
+                    value = field.clean('' if value is None else value)
+                data[name] = value
+            except forms.ValidationError as exc:
+                errors.append(f"{field.label or name}: {' '.join(exc.messages)}")
+
+        project = raw.get('project')
+        if project not in (None, ''):
+            data['project_id'] = self.projects.get(_normalize(project))
+            if data['project_id'] is None:
+                errors.append(f"Obra desconocida: {project}")
+
+        if errors:
+            raise forms.ValidationError(errors)
+        return data
+
+
+def _flush(batch, result):
+    with transaction.atomic():
+        Expense.objects.bulk_create(batch)
+        rollups.add_expenses(batch)   # bulk_create no dispara signals
+    suggest.add_expenses(batch)
+    list_cache.bump([e.created_by_id for e in batch])
+    result.created += len(batch)
+    batch.clear()
+
+
+def import_expenses(fileobj, filename, user, batch_size=IMPORT_BATCH_SIZE):
+    """Importa el archivo como gastos de `user`. Devuelve un ImportResult."""
+    result = ImportResult()
+    batch = []
+    # Fechas con el formato local (dd/mm/aaaa) además de ISO
+    with translation.override(settings.LANGUAGE_CODE):
+        cleaner = _RowCleaner()
+        try:
+            for line, raw in iter_rows(fileobj, filename):
+                try:
+                    data = cleaner.clean(raw)
+                except forms.ValidationError as exc:
+                    result.add_error(line, '; '.join(exc.messages))
+                    continue
+                batch.append(Expense(created_by=user, **data))
+                if len(batch) >= batch_size:
+                    _flush(batch, result)
+        except forms.ValidationError as exc:
+            result.add_error(1, '; '.join(exc.messages))
+        except (csv.Error, UnicodeDecodeError, OSError, ValueError, BadZipFile) as exc:
+            result.add_error(0, f"No se pudo leer el archivo: {exc}")
+        if batch:
+            _flush(batch, result)
+    return result
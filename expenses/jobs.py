@@ -0,0 +1,106 @@
+# expenses/jobs.py
+"""Export en segundo plano: el worker (manage.py run_export_jobs) usa estas funciones."""
+import logging
+import time
+from datetime import timedelta
+from tempfile import TemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.http import QueryDict
+from django.utils import timezone
+
+from .models import ExportJob
+from .utils import build_export
+from .filters import filter_expenses, export_filename
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos (como mucho) se guarda el progreso en la BD
+PROGRESS_INTERVAL = 1.0
+
+
+def requeue_stale_jobs():
+    """
+    Jobs 'running' hace más de EXPORT_JOB_TIMEOUT_MINUTES: el worker que los
+    tomó murió (o se reinició) sin terminarlos. Vuelven a la cola desde cero.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.EXPORT_JOB_TIMEOUT_MINUTES)
+    stale = ExportJob.objects.filter(status='running', started_at__lt=cutoff)
+    count = stale.update(status='pending', started_at=None, rows_done=0, receipts_done=0)
+    if count:
+        logger.warning("%s export job(s) colgados vuelven a la cola", count)
+    return count
+
+
+def claim_next_job():
+    """
+    Toma el job pendiente más viejo y lo marca 'running'. El UPDATE condicionado
+    a status='pending' evita que dos workers agarren el mismo job.
+    Antes devuelve a la cola los jobs colgados (ver requeue_stale_jobs).
+    """
+    requeue_stale_jobs()
+    for pk in ExportJob.objects.filter(status='pending').order_by('created_at', 'id').values_list('pk', flat=True)[:10]:
+        claimed = ExportJob.objects.filter(pk=pk, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def _progress_writer(job):
+    """Callback para build_export: acumula el avance y lo guarda cada PROGRESS_INTERVAL."""
+    state = {'last': 0.0}
+
+    def progress(**fields):
+        for name, value in fields.items():
+            setattr(job, f"{name}_done" if name in ('rows', 'receipts') else name, value)
+        now = time.monotonic()
+        if now - state['last'] >= PROGRESS_INTERVAL or 'receipts_total' in fields:
+            state['last'] = now
+            ExportJob.objects.filter(pk=job.pk).update(
+                rows_done=job.rows_done, receipts_done=job.receipts_done,
+                receipts_total=job.receipts_total,
+            )
+    return progress
+
+
+def run_job(job):
+    """Arma el ZIP del job a un temporal y lo sube a media storage con vencimiento."""
+    try:
+        qs, form = filter_expenses(QueryDict(job.query) or None, job.created_by)
+        job.rows_total = qs.count()
+        job.save(update_fields=['rows_total'])
+
+        with TemporaryFile() as tmp:
+            for chunk in build_export(qs, progress=_progress_writer(job)):
+                tmp.write(chunk)
+            tmp.seek(0)
+            job.filename = export_filename(form, job.created_by)
+            job.file.save(f"export-{job.pk}.zip", File(tmp), save=False)
+
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.expires_at = job.finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+        job.save()
+        logger.info("export job %s listo: %s filas, %s recibos", job.pk, job.rows_done, job.receipts_done)
+    except Exception as exc:
+        logger.exception("export job %s falló", job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def purge_expired_jobs():
+    """Borra los archivos vencidos de media storage y marca los jobs como 'expired'."""
+    count = 0
+    for job in ExportJob.objects.filter(status='done', expires_at__lte=timezone.now()):
+        if job.file:
+            job.file.delete(save=False)
+        job.status = 'expired'
+        job.save(update_fields=['status', 'file'])
+        count += 1
+    return count
@@ -0,0 +1,84 @@
+# expenses/list_cache.py
+"""
+Cache del render de la tabla de /gastos/ y ETag de la página.
+
+La clave junta: usuario y alcance (manager ve todo, operador lo propio),
+filtros y cursor/página del query string, el secreto CSRF (la tabla lleva los
+forms de borrar) y la versión de datos del alcance. Cada alta, edición o baja
+de un gasto o recibo cambia la versión de 'all' y la del dueño; cambios de
+obras o usuarios (se muestran sus nombres) cambian la época común.
+
+Con la misma clave (y los mismos exports en curso) el ETag no cambia, así que
+una vista repetida termina en 304 sin consultar gastos ni renderizar nada.
+
+Las versiones tienen que estar en un cache compartido por todos los procesos
+(ver CACHES en settings): el import, el seed o el admin de otro worker las
+cambian y el próximo request de cualquier proceso ya ve la clave nueva.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Subirlo cuando cambie el template de la tabla, así se ignora lo cacheado antes
+LIST_FORMAT_VERSION = 1
+
+EPOCH = 'epoch'
+
+
+def scope(user, manager):
+    return 'all' if manager else f"user:{user.pk}"
+
+
+def _version_key(name):
+    return f"expenses:list:version:{name}"
+
+
+def versions(*names):
+    """Versión actual de cada nombre (si no existe o se desalojó, se crea una nueva)."""
+    keys = {_version_key(n): n for n in names}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[_version_key(n)] for n in names]
+
+
+def bump(user_ids=None):
+    """Datos de gastos cambiaron: nueva versión para 'all' y para cada dueño (o época común)."""
+    now = time.time_ns()
+    if user_ids is None:
+        cache.set(_version_key(EPOCH), now, None)
+        return
+    names = ['all'] + [f"user:{pk}" for pk in set(user_ids) if pk is not None]
+    cache.set_many({_version_key(n): now for n in names}, None)
+
+
+def cache_key(request, manager):
+    name = scope(request.user, manager)
+    payload = json.dumps({
+        'v': LIST_FORMAT_VERSION,
+        'user': request.user.pk,
+        'scope': name,
+        'query': sorted(request.GET.lists()),
+        'csrf': request.META.get('CSRF_COOKIE', ''),
+        'data': versions(EPOCH, name),
+    }, sort_keys=True)
+    return 'expenses:list:' + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def etag(key, extra=()):
+    """ETag de la página: la clave de la tabla más lo que se renderiza fuera de ella."""
+    stamp = json.dumps([key, list(extra)], default=str)
+    return f'"{hashlib.sha256(stamp.encode()).hexdigest()[:32]}"'
+
+
+def get(key):
+    return cache.get(key)
+
+
+def store(key, html):
+    cache.set(key, html, settings.LIST_CACHE_TTL)
@@ -0,0 +1,248 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from expenses import list_cache
+from expenses.deletion import delete_expenses, process_pending_files
+from expenses.models import Expense, Project, Receipt
+from expenses.pagination import encode_cursor
+from expenses.seeding import ImagePool, PROJECT_PREFIX, seed, synthetic_jpeg
+from expenses.timing import Timings
+from expenses.utils import build_export
+from expenses.views import ExpenseListView
+
+CASES = ('list', 'export', 'create', 'delete')
+BENCH_CATEGORY = 'Benchmark'
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=settings.BASE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Mide lista (por profundidad de página), build_export (por tamaño), alta con varias "
+            "fotos y borrado masivo: tiempo, queries y pico de memoria. Escribe el resultado en "
+            "JSON para comparar corridas. Usa la base configurada: correrlo sobre datos de "
+            "prueba (manage.py seed_data), no en producción.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Archivo JSON de salida. Default: bench-<fecha>.json')
+        parser.add_argument('--compare', help='JSON de una corrida anterior para mostrar la diferencia.')
+        parser.add_argument('--only', nargs='+', choices=CASES, default=list(CASES))
+        parser.add_argument('--repeat', type=int, default=3, help='Corridas medidas por caso. Default: 3.')
+        parser.add_argument('--user', help='Manager con el que se hacen los requests. Default: el primer superusuario.')
+        parser.add_argument('--depths', type=_ints, default=[1, 10, 100, 1000],
+                            help='Páginas de la lista a medir. Default: 1,10,100,1000.')
+        parser.add_argument('--export-sizes', type=_ints, default=[100, 1000, 10000],
+                            help='Cantidad de gastos por export. Default: 100,1000,10000.')
+        parser.add_argument('--upload-files', type=int, default=5,
+                            help='Fotos por alta (tamaño cámara, 3000x4000). Default: 5.')
+        parser.add_argument('--delete-size', type=int, default=500,
+                            help='Gastos (con recibo) que se crean y se borran por corrida. Default: 500.')
+
+    # --- Medición ---
+    def _measure(self, name, params, fn, repeat, setup=None, teardown=None):
+        """
+        `repeat` corridas con tiempo y queries (execute_wrapper) + una más bajo
+        tracemalloc para el pico de memoria Python (aparte: tracemalloc enlentece).
+        """
+        runs, extra = [], {}
+        for i in range(repeat + 1):
+            arg = setup() if setup else None
+            timings = Timings()
+            profile = i == repeat
+            if profile:
+                tracemalloc.start()
+            try:
+                with connection.execute_wrapper(timings):
+                    t0 = time.perf_counter()
+                    extra = fn(arg) or {}
+                    ms = (time.perf_counter() - t0) * 1000
+                if profile:
+                    peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                if profile:
+                    tracemalloc.stop()
+                if teardown:
+                    teardown(arg)
+            if not profile:
+                runs.append((ms, timings.queries, timings.db))
+
+        times = [ms for ms, _, _ in runs]
+        result = {
+            'name': name, 'params': params,
+            'runs_ms': [round(ms, 1) for ms in times],
+            'median_ms': round(statistics.median(times), 1),
+            'min_ms': round(min(times), 1),
+            'queries': runs[0][1],
+            'db_ms': round(statistics.median(db for _, _, db in runs), 1),
+            'peak_kb': peak // 1024,
+            **extra,
+        }
+        self.stdout.write(
+            f"{name:<8} {json.dumps(params):<30} {result['median_ms']:>10.1f} ms "
+            f"{result['queries']:>6} q {result['peak_kb']:>9} KB"
+        )
+        return result
+
+    # --- Casos ---
+    def _bench_list(self, client, opts):
+        per_page = ExpenseListView.paginate_by
+        ordered = Expense.objects.order_by('-date', '-id')
+        results = []
+        for depth in opts['depths']:
+            if settings.EXPENSE_LIST_PAGINATION == 'cursor':
+                # El cursor de la página N es el último gasto de la N-1 (como al ir con "Siguiente")
+                last = ordered[(depth - 1) * per_page - 1:][:1].first() if depth > 1 else None
+                if depth > 1 and last is None:
+                    continue
+                url = reverse('expense-list') + (f"?cursor={encode_cursor('n', last)}" if last else '')
+            else:
+                url = reverse('expense-list') + f"?page={depth}"
+
+            def fn(_, url=url):
+                resp = client.get(url)
+                if resp.status_code != 200:
+                    raise CommandError(f"{url} devolvió {resp.status_code}")
+            # Frío: nueva época del cache de la lista antes de cada corrida (consultas + render,
+            # comparable con corridas anteriores al cache); tibio: la tabla sale del cache
+            results.append(self._measure('list', {'depth': depth}, fn, opts['repeat'], setup=list_cache.bump))
+            results.append(self._measure('list', {'depth': depth, 'cache': 'warm'}, fn, opts['repeat']))
+        return results
+
+    def _bench_export(self, client, opts):
+        results = []
+        total = Expense.objects.count()
+        for size in opts['export_sizes']:
+            if size > total:
+                continue
+            qs = Expense.objects.filter(pk__in=Expense.objects.order_by('-date', '-id').values('pk')[:size])
+
+            def fn(_, qs=qs):
+                return {'bytes': sum(len(chunk) for chunk in build_export(qs))}
+            results.append(self._measure('export', {'expenses': size}, fn, opts['repeat']))
+        return results
+
+    def _bench_create(self, client, opts, user):
+        photo = synthetic_jpeg(3000, 4000, seed=99, quality=92)
+        data = {
+            'date': datetime.now().date().isoformat(), 'category': BENCH_CATEGORY, 'vendor': 'YPF',
+            'description': 'benchmark', 'amount': '1234.50', 'payment_method': 'cash',
+        }
+
+        def fn(_):
+            files = [SimpleUploadedFile(f"IMG_{i}.jpg", photo, 'image/jpeg') for i in range(opts['upload_files'])]
+            resp = client.post(reverse('expense-create'), {**data, 'image': files})
+            if resp.status_code != 302:
+                raise CommandError(f"El alta devolvió {resp.status_code}")
+
+        def teardown(_):
+            delete_expenses(Expense.objects.filter(category=BENCH_CATEGORY, created_by=user))
+            process_pending_files(grace=0)   # base de prueba: no hay subidas concurrentes
+        return [self._measure('create', {'files': opts['upload_files'], 'file_kb': len(photo) // 1024},
+                              fn, opts['repeat'], teardown=teardown)]
+
+    def _bench_delete(self, client, opts, user):
+        project, _ = Project.objects.get_or_create(
+            code=f"{PROJECT_PREFIX}-DELETE", defaults={'name': 'Obra sintética (borrado)'}
+        )
+        pool = ImagePool(size=(600, 800), count=2)
+        url = reverse('expense-bulk-delete') + f"?project={project.pk}"
+
+        def setup():
+            seed(opts['delete_size'], receipts_per_expense=1, owner=user, project=project, pool=pool)
+
+        def fn(_):
+            resp = client.post(url)
+            if resp.status_code != 302:
+                raise CommandError(f"El borrado devolvió {resp.status_code}")
+            return {'remaining': Expense.objects.filter(project=project).count()}
+
+        def teardown(_):
+            process_pending_files(grace=0)   # base de prueba: no hay subidas concurrentes
+        return [self._measure('delete', {'expenses': opts['delete_size']}, fn, opts['repeat'],
+                              setup=setup, teardown=teardown)]
+
+    # --- Comando ---
+    def _user(self, username):
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError("No hay usuario para medir (usar --user con un manager o crear un superusuario).")
+        return user
+
+    def _compare(self, results, path):
+        with open(path) as f:
+            before = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in json.load(f)['results']}
+        self.stdout.write(f"\nContra {path}:")
+        for r in results:
+            old = before.get((r['name'], json.dumps(r['params'], sort_keys=True)))
+            if not old:
+                continue
+            delta = (r['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+            self.stdout.write(
+                f"{r['name']:<8} {json.dumps(r['params']):<30} {old['median_ms']:>10.1f} → "
+                f"{r['median_ms']:.1f} ms ({delta:+.0f}%), queries {old['queries']} → {r['queries']}"
+            )
+
+    def handle(self, *args, **opts):
+        if opts['repeat'] < 1:
+            raise CommandError("--repeat tiene que ser al menos 1.")
+        user = self._user(opts['user'])
+        client = Client()
+        client.force_login(user)
+
+        self.stdout.write(f"{'caso':<8} {'parámetros':<30} {'mediana':>13} {'queries':>8} {'pico mem':>12}")
+        results = []
+        if 'list' in opts['only']:
+            results += self._bench_list(client, opts)
+        if 'export' in opts['only']:
+            results += self._bench_export(client, opts)
+        if 'create' in opts['only']:
+            results += self._bench_create(client, opts, user)
+        if 'delete' in opts['only']:
+            results += self._bench_delete(client, opts, user)
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'commit': _git_commit(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'expenses': Expense.objects.count(),
+                'receipts': Receipt.objects.count(),
+                'pagination': settings.EXPENSE_LIST_PAGINATION,
+                'repeat': opts['repeat'],
+                'user': user.username,
+            },
+            'results': results,
+        }
+        output = opts['output'] or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados en {output}"))
+
+        if opts['compare']:
+            self._compare(results, opts['compare'])
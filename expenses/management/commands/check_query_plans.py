@@ -0,0 +1,86 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from expenses.models import Expense
+from expenses.pagination import keyset_queryset
+
+
+class Command(BaseCommand):
+    help = ("Corre EXPLAIN (SQLite o Postgres) sobre las consultas de la lista y del export "
+            "y falla si no usan los índices compuestos o si tienen que ordenar.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show-plans', action='store_true',
+                            help='Imprime el plan completo de cada consulta.')
+
+    def _cases(self):
+        """(nombre, queryset, índice esperado): mismas formas que arma _filtered_queryset."""
+        start, end = datetime.date(2025, 1, 1), datetime.date(2025, 3, 31)
+        page = 21  # paginate_by + 1 (paginación por cursor)
+        lista = Expense.objects.select_related('project', 'created_by')
+        export = Expense.objects.all()  # build_export: select_related(None), orden (date, id)
+        return [
+            ('lista operador',
+             lista.filter(created_by_id=1).order_by('-date', '-id')[:page], 'expense_owner_date_idx'),
+            ('lista operador + fechas',
+             lista.filter(created_by_id=1, date__gte=start, date__lte=end).order_by('-date', '-id')[:page],
+             'expense_owner_date_idx'),
+            ('lista operador, página N',
+             keyset_queryset(lista.filter(created_by_id=1), 'n', end, 1000)[:page], 'expense_owner_date_idx'),
+            ('lista por obra + fechas',
+             lista.filter(project_id=1, date__gte=start, date__lte=end).order_by('-date', '-id')[:page],
+             'expense_project_date_idx'),
+            ('lista manager',
+             lista.order_by('-date', '-id')[:page], 'expense_date_idx'),
+            ('lista manager + fechas',
+             lista.filter(date__gte=start, date__lte=end).order_by('-date', '-id')[:page], 'expense_date_idx'),
+            ('lista manager, página N',
+             keyset_queryset(lista, 'n', end, 1000)[:page], 'expense_date_idx'),
+            ('export operador + fechas',
+             export.filter(created_by_id=1, date__gte=start, date__lte=end).order_by('date', 'id'),
+             'expense_owner_date_idx'),
+            ('export por obra',
+             export.filter(project_id=1).order_by('date', 'id'), 'expense_project_date_idx'),
+            ('export manager + fechas',
+             export.filter(date__gte=start, date__lte=end).order_by('date', 'id'), 'expense_date_idx'),
+        ]
+
+    def _problems(self, plan, index):
+        problems = []
+        if index not in plan:
+            problems.append(f"no usa {index}")
+        if connection.vendor == 'sqlite':
+            if 'TEMP B-TREE' in plan:
+                problems.append('ordena en un B-tree temporal')
+        elif any(line.strip().startswith(('Sort', 'Incremental Sort')) for line in plan.splitlines()):
+            problems.append('tiene un nodo Sort')
+        return problems
+
+    def handle(self, *args, **opts):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Motor no soportado: {connection.vendor} (solo SQLite o Postgres).")
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Con tablas chicas el planner prefiere seq scan; para el chequeo lo desalentamos
+                cursor.execute('SET enable_seqscan = off')
+
+        failed = 0
+        for name, qs, index in self._cases():
+            plan = qs.explain()
+            problems = self._problems(plan, index)
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"FAIL {name}: {', '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {name} ({index})"))
+            if opts['show_plans'] or problems:
+                self.stdout.write(plan)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+        if failed:
+            raise CommandError(f"{failed} consulta(s) sin el plan esperado.")
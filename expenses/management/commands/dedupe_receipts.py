@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from expenses.blobs import BLOB_PREFIX, THUMB_PREFIX, delete_if_unreferenced, is_blob_name, store_blob
+from expenses.models import Receipt
+
+
+class Command(BaseCommand):
+    help = ("Mueve los recibos existentes al storage por contenido (SHA-256): los archivos "
+            "idénticos quedan guardados una sola vez y se borran las copias.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo informa cuántos archivos se moverían.')
+
+    def handle(self, *args, **opts):
+        moved = freed = missing = 0
+        pending = Receipt.objects.exclude(image__startswith=f"{BLOB_PREFIX}/").order_by('id')
+        if opts['dry_run']:
+            self.stdout.write(f"{pending.count()} recibo(s) fuera del storage por contenido.")
+            return
+
+        for r in pending.iterator(chunk_size=200):
+            storage = r.image.storage
+            old_image, old_thumb = r.image.name, r.thumbnail.name
+            try:
+                with storage.open(old_image, 'rb') as f:
+                    r.image, r.sha256 = store_blob(storage, f)
+                if old_thumb and not is_blob_name(old_thumb, THUMB_PREFIX):
+                    with storage.open(old_thumb, 'rb') as f:
+                        r.thumbnail, _ = store_blob(storage, f, THUMB_PREFIX)
+            except FileNotFoundError:
+                missing += 1
+                continue
+            # update() y no save(): no es un cambio del gasto (no invalida caches/exports)
+            Receipt.objects.filter(pk=r.pk).update(image=r.image.name, thumbnail=r.thumbnail.name, sha256=r.sha256)
+            moved += 1
+            for name in {old_image, old_thumb} - {r.image.name, r.thumbnail.name}:
+                freed += delete_if_unreferenced(storage, name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} recibo(s) movido(s), {freed} archivo(s) liberado(s), {missing} sin archivo."
+        ))
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importer import import_expenses
+
+
+class Command(BaseCommand):
+    help = "Importa gastos desde un CSV o XLSX (mismas reglas que la carga manual)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo .csv o .xlsx')
+        parser.add_argument('--user', required=True, help='Usuario al que se cargan los gastos.')
+
+    def handle(self, *args, **opts):
+        try:
+            user = User.objects.get(username=opts['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {opts['user']!r}.")
+
+        with open(opts['path'], 'rb') as f:
+            result = import_expenses(f, opts['path'], user)
+
+        for line, message in result.errors:
+            self.stderr.write(f"fila {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} gasto(s) importado(s), {result.error_count} fila(s) con errores."
+        ))
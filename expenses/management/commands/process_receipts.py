@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from expenses.blobs import delete_if_unreferenced
+from expenses.images import process_uploads
+from expenses.models import Receipt
+
+
+class Command(BaseCommand):
+    help = ("Backfill: normaliza (orientación, resolución, re-encode) y genera miniatura "
+            "para los recibos cargados antes del procesamiento al subir.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=20,
+                            help='Recibos por lote (default: 20).')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='No borrar del storage el archivo original.')
+
+    def handle(self, *args, **opts):
+        done = skipped = 0
+        while True:
+            batch = list(Receipt.objects.filter(processed=False).order_by('id')[:opts['batch']])
+            if not batch:
+                break
+
+            readable, missing = [], []
+            for r in batch:
+                try:
+                    with r.image.open('rb') as f:
+                        readable.append((r, f.read()))
+                except (FileNotFoundError, ValueError):
+                    missing.append(r.pk)
+
+            results = process_uploads([(r.image.name, data) for r, data in readable])
+            for (r, _), (image, thumb) in zip(readable, results):
+                if thumb is None:
+                    # No es una imagen: queda como está
+                    missing.append(r.pk)
+                    continue
+                old_name = r.image.name
+                # Receipt.save() los guarda por contenido (blobs.py) y completa sha256
+                r.image = image
+                r.thumbnail = thumb
+                r.processed = True
+                r.save(update_fields=['image', 'thumbnail', 'processed', 'sha256'])
+                if not opts['keep_originals']:
+                    delete_if_unreferenced(r.image.storage, old_name)
+                done += 1
+
+            # Los que no se pueden procesar se marcan igual, para no reintentarlos
+            Receipt.objects.filter(pk__in=missing).update(processed=True)
+            skipped += len(missing)
+
+        self.stdout.write(self.style.SUCCESS(f"{done} recibo(s) procesado(s), {skipped} omitido(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from expenses.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalcula ExpenseRollup desde cero a partir de la tabla de gastos (y compacta duplicados)."
+
+    def handle(self, *args, **opts):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} fila(s) de rollup generadas."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from expenses import search
+
+
+class Command(BaseCommand):
+    help = ("Recrea el índice full-text de gastos (tabla FTS5 + triggers en SQLite, tsvector + GIN "
+            "en Postgres) y lo rellena. Usar si una migración rehízo la tabla de gastos en SQLite.")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            search.uninstall(connection)
+            if not search.install(connection):
+                raise CommandError(f"La base ({connection.vendor}) no soporta búsqueda full-text; "
+                                   "se usa icontains.")
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
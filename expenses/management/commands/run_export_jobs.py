@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses.deletion import process_pending_files
+from expenses.jobs import claim_next_job, run_job, purge_expired_jobs
+
+
+class Command(BaseCommand):
+    help = ("Worker en segundo plano: procesa ExportJob pendientes, purga los vencidos y "
+            "borra los archivos de recibos encolados al borrar gastos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Procesa lo pendiente y termina (útil para cron).')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Segundos de espera cuando no hay jobs (default: 2).')
+
+    def handle(self, *args, **opts):
+        while True:
+            purged = purge_expired_jobs()
+            if purged:
+                self.stdout.write(f"{purged} export(s) vencido(s) purgado(s).")
+            removed = process_pending_files()
+            if removed:
+                self.stdout.write(f"{removed} archivo(s) de recibos borrado(s).")
+
+            job = claim_next_job()
+            while job:
+                self.stdout.write(f"Procesando export #{job.pk}…")
+                job = run_job(job)
+                self.stdout.write(f"Export #{job.pk}: {job.get_status_display()}")
+                job = claim_next_job()
+
+            if opts['once']:
+                return
+            time.sleep(opts['interval'])
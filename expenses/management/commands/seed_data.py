@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.seeding import seed
+
+
+def _size(value):
+    try:
+        width, height = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise CommandError(f"Tamaño inválido {value!r} (usar ANCHOxALTO, p. ej. 1500x2000).")
+    return width, height
+
+
+class Command(BaseCommand):
+    help = ("Crea obras, usuarios, gastos y recibos sintéticos (fotos JPEG de tamaño real) "
+            "para medir la app con volumen. Las obras son BENCH-NNN y los usuarios benchNN.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=10000)
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--receipts-per-expense', type=float, default=1.5,
+                            help='Promedio de recibos por gasto (0 = sin fotos). Default: 1.5.')
+        parser.add_argument('--image-size', default='1500x2000',
+                            help='ANCHOxALTO de las fotos sintéticas. Default: 1500x2000 (≈ 600 KB).')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Los gastos se reparten en los últimos N días. Default: 730.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla (corridas reproducibles).')
+
+    def handle(self, *args, **opts):
+        def progress(expenses, receipts):
+            self.stdout.write(f"  {expenses} gastos, {receipts} recibos…")
+
+        expenses, receipts = seed(
+            opts['expenses'], projects=opts['projects'], users=opts['users'],
+            receipts_per_expense=opts['receipts_per_expense'], image_size=_size(opts['image_size']),
+            days=opts['days'], rng_seed=opts['seed'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"{expenses} gasto(s) y {receipts} recibo(s) creados."))
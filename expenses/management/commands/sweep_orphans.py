@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from expenses.blobs import delete_unreferenced
+from expenses.deletion import process_pending_files
+from expenses.models import Receipt
+
+# Carpetas de media donde viven archivos de recibos (upload_to viejo + layout por contenido)
+RECEIPT_DIRS = ('receipts/originals', 'receipts/blobs', 'receipts/thumbs')
+
+
+class Command(BaseCommand):
+    help = ("Borra de media los archivos de recibos que no referencia ningún Receipt "
+            "(lo acumulado antes del borrado diferido).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo lista lo que borraría.')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='No tocar archivos más nuevos que esto (subidas en curso). Default: 24.')
+        parser.add_argument('--batch', type=int, default=500)
+
+    def _walk(self, storage, path):
+        dirs, files = storage.listdir(path)
+        for name in files:
+            yield f"{path}/{name}"
+        for d in dirs:
+            yield from self._walk(storage, f"{path}/{d}")
+
+    def _sweep(self, storage, names, cutoff, dry_run):
+        in_use = {
+            name
+            for pair in Receipt.objects.filter(Q(image__in=names) | Q(thumbnail__in=names))
+            .values_list('image', 'thumbnail')
+            for name in pair
+        }
+        count = 0
+        for name in set(names) - in_use:
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            if dry_run:
+                self.stdout.write(name)
+                count += 1
+            elif delete_unreferenced(storage, name):   # vuelve a mirar referencias y el margen de gracia
+                count += 1
+        return count
+
+    def handle(self, *args, **opts):
+        storage = Receipt._meta.get_field('image').storage
+        if not opts['dry_run']:
+            # Primero lo que ya estaba encolado
+            process_pending_files(storage)
+
+        cutoff = timezone.now() - timedelta(hours=opts['min_age_hours'])
+        total = 0
+        for directory in RECEIPT_DIRS:
+            if not storage.exists(directory):
+                continue
+            batch = []
+            for name in self._walk(storage, directory):
+                batch.append(name)
+                if len(batch) >= opts['batch']:
+                    total += self._sweep(storage, batch, cutoff, opts['dry_run'])
+                    batch = []
+            if batch:
+                total += self._sweep(storage, batch, cutoff, opts['dry_run'])
+
+        verb = 'a borrar' if opts['dry_run'] else 'borrado(s)'
+        self.stdout.write(self.style.SUCCESS(f"{total} archivo(s) huérfano(s) {verb}."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_expense_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='processed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='receipts/thumbs/'),
+        ),
+    ]
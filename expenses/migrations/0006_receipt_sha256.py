@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_receipt_thumbnail_processed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
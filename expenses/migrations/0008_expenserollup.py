@@ -0,0 +1,52 @@
+# Generated by Django 5.0.7 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollups(apps, schema_editor):
+    """Carga inicial de los rollups con los gastos existentes."""
+    Expense = apps.get_model('expenses', 'Expense')
+    ExpenseRollup = apps.get_model('expenses', 'ExpenseRollup')
+    rows = (
+        Expense.objects.order_by()
+        .annotate(period=TruncMonth('date'))
+        .values('period', 'project_id', 'created_by_id', 'category')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    )
+    ExpenseRollup.objects.bulk_create([
+        ExpenseRollup(period=r['period'], project_id=r['project_id'], user_id=r['created_by_id'],
+                      category=r['category'], total=r['total'], count=r['n'])
+        for r in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Mes')),
+                ('category', models.CharField(max_length=100, verbose_name='Categoría')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('count', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('project', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='expenses.project', verbose_name='Obra/Proyecto')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Cargado por')),
+            ],
+            options={
+                'ordering': ('-period',),
+                'indexes': [models.Index(fields=['period', 'project', 'user', 'category'], name='rollup_key_idx'), models.Index(fields=['user', 'period'], name='rollup_user_period_idx'), models.Index(fields=['project', 'period'], name='rollup_project_period_idx')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
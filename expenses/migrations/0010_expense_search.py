@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from expenses import search
+
+
+def install(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Índice full-text de proveedor/descripción/notas (ver expenses/search.py):
+    tsvector generado + GIN en Postgres, tabla FTS5 con triggers en SQLite.
+    No cambia el modelo: la columna/tabla no la maneja el ORM.
+    """
+
+    dependencies = [
+        ('expenses', '0009_pendingfiledeletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall, elidable=False),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_expense_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeltaExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_key', models.CharField(max_length=64)),
+                ('query', models.CharField(blank=True, max_length=500, verbose_name='Filtros')),
+                ('expenses_until', models.DateTimeField(blank=True, null=True)),
+                ('last_expense_id', models.PositiveIntegerField(default=0)),
+                ('receipts_until', models.DateTimeField(blank=True, null=True)),
+                ('last_receipt_id', models.PositiveIntegerField(default=0)),
+                ('expenses_count', models.PositiveIntegerField(default=0)),
+                ('receipts_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['created_at', 'id'], name='expense_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['uploaded_at', 'id'], name='receipt_uploaded_idx'),
+        ),
+        migrations.AddField(
+            model_name='deltaexport',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='delta_exports', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='deltaexport',
+            index=models.Index(fields=['user', 'filter_key', 'id'], name='delta_export_mark_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_delta_export'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='query',
+            field=models.TextField(blank=True, verbose_name='Filtros'),
+        ),
+    ]
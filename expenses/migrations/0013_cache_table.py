@@ -0,0 +1,19 @@
+# Tabla del cache de Django (DatabaseCache, ver CACHES en settings); con Redis no hace nada
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_exportjob_query_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
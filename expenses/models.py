@@ -1,8 +1,11 @@
 # expenses/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .blobs import store_blob, THUMB_PREFIX
+
 
 class Project(models.Model):
     """Obra/Job al que se imputa el gasto."""
@@ -36,20 +39,34 @@ class Expense(models.Model):
     payment_method = models.CharField('Medio de pago', max_length=20, choices=PAYMENT_CHOICES)
 
     # NUEVO: relación a Obra/Proyecto (opcional) y dueño del registro
+    # db_index=False: los índices compuestos de Meta ya empiezan por estas columnas
     project = models.ForeignKey(Project, verbose_name='Obra/Proyecto',
-                                null=True, blank=True, on_delete=models.SET_NULL)
+                                null=True, blank=True, on_delete=models.SET_NULL,
+                                db_index=False)
     created_by = models.ForeignKey(User, verbose_name='Cargado por',
                                    on_delete=models.PROTECT,
-                                   null=True, blank=True, related_name='expenses')
+                                   null=True, blank=True, related_name='expenses',
+                                   db_index=False)
 
     # Campo libre que ya tenías: lo mantenemos por compatibilidad (si después migrás 100% a Project lo retiramos)
     project_code = models.CharField('Código/Obra (texto)', max_length=50, blank=True)
 
     notes = models.TextField('Notas', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Se toca también cuando cambian sus recibos (ver signals.py); lo usa el cache de exports
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ('-date', '-id')
+        # Mismo patrón que _filtered_queryset: dueño/obra + rango de fechas, orden (date, id).
+        # El índice se recorre al revés para -date, -id, así que no hace falta ordenar.
+        indexes = [
+            models.Index(fields=['created_by', 'date', 'id'], name='expense_owner_date_idx'),
+            models.Index(fields=['project', 'date', 'id'], name='expense_project_date_idx'),
+            models.Index(fields=['date', 'id'], name='expense_date_idx'),
+            # Exports incrementales: "cargados después de la marca" (ver delta.py)
+            models.Index(fields=['created_at', 'id'], name='expense_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id or 'new'} · {self.vendor} · ${self.amount}"
@@ -59,14 +76,34 @@ class Receipt(models.Model):
     """Foto/s del ticket asociadas al gasto."""
     expense = models.ForeignKey(Expense, related_name='receipts', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='receipts/originals/')
+    # Miniatura para la lista; processed=False → todavía no pasó por images.process_uploads
+    thumbnail = models.ImageField(upload_to='receipts/thumbs/', blank=True)
+    processed = models.BooleanField(default=False)
+    # Hash del contenido: archivos idénticos comparten el mismo blob (ver blobs.py)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     original_name = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Exports incrementales: recibos agregados después de la marca (ver delta.py)
+            models.Index(fields=['uploaded_at', 'id'], name='receipt_uploaded_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.image and not self.original_name:
             self.original_name = self.image.name
+        self.store_files()
         super().save(*args, **kwargs)
 
+    def store_files(self):
+        """Archivos nuevos (todavía no guardados) van al storage por contenido.
+        save() lo llama solo; con bulk_create hay que llamarlo antes."""
+        if self.image and not self.image._committed:
+            self.image, self.sha256 = store_blob(self.image.storage, self.image.file)
+        if self.thumbnail and not self.thumbnail._committed:
+            self.thumbnail, _ = store_blob(self.thumbnail.storage, self.thumbnail.file, THUMB_PREFIX)
+
     def export_filename(self):
         base = f"EXP-{self.expense_id}-{slugify(self.expense.vendor or 'proveedor')}"
         ext = (self.image.name.split('.')[-1] or 'jpg').lower()
@@ -74,3 +111,116 @@ class Receipt(models.Model):
 
     def __str__(self):
         return f"Recibo {self.id} de gasto {self.expense_id}"
+
+
+class ExportJob(models.Model):
+    """Export ZIP armado en segundo plano (worker: manage.py run_export_jobs)."""
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('running', 'Procesando'),
+        ('done', 'Listo'),
+        ('failed', 'Falló'),
+        ('expired', 'Vencido'),
+    ]
+
+    created_by = models.ForeignKey(User, verbose_name='Pedido por',
+                                   on_delete=models.CASCADE, related_name='export_jobs')
+    # Querystring de filtros tal cual venía de la lista (start, end, project, user, q):
+    # TextField porque una búsqueda larga no entra en un largo fijo
+    query = models.TextField('Filtros', blank=True)
+    status = models.CharField('Estado', max_length=10, choices=STATUS_CHOICES,
+                              default='pending', db_index=True)
+
+    # Progreso (lo actualiza el worker mientras arma el ZIP)
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    receipts_total = models.PositiveIntegerField(default=0)
+    receipts_done = models.PositiveIntegerField(default=0)
+
+    file = models.FileField(upload_to='exports/', blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at', '-id')
+
+    def is_expired(self):
+        return bool(self.expires_at and self.expires_at <= timezone.now())
+
+    def __str__(self):
+        return f"Export {self.id} ({self.status}) de {self.created_by_id}"
+
+
+class DeltaExport(models.Model):
+    """
+    Export incremental ya generado: la marca de agua (hasta qué gasto y qué
+    recibo, en orden (fecha de alta, id)) por usuario y filtro. El próximo
+    export de ese usuario+filtro arranca desde la última (ver delta.py).
+    """
+    user = models.ForeignKey(User, verbose_name='Usuario', on_delete=models.CASCADE,
+                             related_name='delta_exports', db_index=False)
+    # Hash de filtros normalizados + alcance de visibilidad
+    filter_key = models.CharField(max_length=64)
+    query = models.CharField('Filtros', max_length=500, blank=True)
+
+    expenses_until = models.DateTimeField(null=True, blank=True)
+    last_expense_id = models.PositiveIntegerField(default=0)
+    receipts_until = models.DateTimeField(null=True, blank=True)
+    last_receipt_id = models.PositiveIntegerField(default=0)
+
+    expenses_count = models.PositiveIntegerField(default=0)
+    receipts_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = [
+            models.Index(fields=['user', 'filter_key', 'id'], name='delta_export_mark_idx'),
+        ]
+
+    def __str__(self):
+        return f"Delta {self.id} de {self.user_id} ({self.expenses_count} gastos)"
+
+
+class ExpenseRollup(models.Model):
+    """
+    Totales por mes / obra / usuario / categoría, mantenidos incrementalmente
+    (ver rollups.py). Puede haber más de una fila por clave (altas concurrentes):
+    las consultas siempre suman, y rebuild_rollups las compacta.
+    """
+    period = models.DateField('Mes')   # primer día del mes
+    project = models.ForeignKey(Project, verbose_name='Obra/Proyecto', null=True, blank=True,
+                                on_delete=models.SET_NULL, db_index=False)
+    user = models.ForeignKey(User, verbose_name='Cargado por', null=True, blank=True,
+                             on_delete=models.SET_NULL, db_index=False)
+    category = models.CharField('Categoría', max_length=100)
+    total = models.DecimalField('Total', max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField('Cantidad', default=0)
+
+    class Meta:
+        ordering = ('-period',)
+        indexes = [
+            models.Index(fields=['period', 'project', 'user', 'category'], name='rollup_key_idx'),
+            models.Index(fields=['user', 'period'], name='rollup_user_period_idx'),
+            models.Index(fields=['project', 'period'], name='rollup_project_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} · {self.category} · ${self.total}"
+
+
+class PendingFileDeletion(models.Model):
+    """Archivo de storage a borrar en segundo plano (lo procesa run_export_jobs)."""
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return self.name
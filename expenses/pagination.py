@@ -0,0 +1,99 @@
+# expenses/pagination.py
+"""
+Paginación por cursor (keyset) para la lista de gastos.
+
+En vez de OFFSET n + COUNT(*), cada página busca "los siguientes 20 después
+de (fecha, id)" sobre el mismo orden de la lista (-date, -id). El costo de la
+página N es el mismo que el de la primera. Los tokens next/prev son opacos
+(base64 de dirección + fecha + id).
+"""
+import base64
+import binascii
+from datetime import date
+
+from django.db.models import Q
+
+
+def encode_cursor(direction, obj):
+    raw = f"{direction}|{obj.date.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """('n'|'p', fecha, id) o None si el token no es válido (→ primera página)."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, day, pk = raw.split('|')
+        if direction not in ('n', 'p'):
+            return None
+        return direction, date.fromisoformat(day), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class CursorPage:
+    """Página de resultados con la interfaz mínima que usa el template."""
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_queryset(qs, direction, day, pk):
+    """
+    Filas después ('n') o antes ('p') de (day, pk) en el orden -date, -id.
+    date <= / >= día acota el rango del índice; el OR solo desempata por id.
+    'p' se devuelve en orden ascendente (hay que dar vuelta el resultado).
+    """
+    if direction == 'n':
+        return (
+            qs.filter(date__lte=day).filter(Q(date__lt=day) | Q(id__lt=pk))
+            .order_by('-date', '-id')
+        )
+    return (
+        qs.filter(date__gte=day).filter(Q(date__gt=day) | Q(id__gt=pk))
+        .order_by('date', 'id')
+    )
+
+
+def paginate_keyset(qs, token, per_page):
+    """
+    Devuelve la CursorPage que corresponde a `token` sobre `qs` (orden -date, -id).
+    Trae per_page + 1 filas para saber si hay más sin hacer COUNT(*).
+    """
+    cursor = decode_cursor(token)
+
+    if cursor is None:
+        rows = list(qs.order_by('-date', '-id')[:per_page + 1])
+        has_more, has_before = len(rows) > per_page, False
+        rows = rows[:per_page]
+    elif cursor[0] == 'n':
+        rows = list(keyset_queryset(qs, *cursor)[:per_page + 1])
+        has_more, has_before = len(rows) > per_page, True
+        rows = rows[:per_page]
+    else:
+        # Hacia atrás: buscamos en orden ascendente y damos vuelta el resultado
+        rows = list(keyset_queryset(qs, *cursor)[:per_page + 1])
+        has_before, has_more = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+
+    next_cursor = encode_cursor('n', rows[-1]) if rows and has_more else None
+    previous_cursor = encode_cursor('p', rows[0]) if rows and has_before else None
+    return CursorPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,104 @@
+# expenses/roles.py
+"""
+Roles del usuario (¿es manager?) resueltos una vez y cacheados.
+
+Dos niveles: en el propio objeto user (dura lo que dura el request) y un
+dict por proceso con vencimiento (ROLE_CACHE_TTL segundos). Cada entrada del
+dict lleva la versión del usuario y la época común, que viven en el cache
+compartido entre procesos (ver CACHES en settings): los signals de abajo las
+cambian y todos los workers dejan de usar el rol viejo en el próximo request.
+
+Vistas, formularios y templates (context processor `roles`) leen de acá.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+MANAGER_GROUPS = ('Manager', 'Managers')
+
+EPOCH_KEY = 'expenses:roles:epoch'
+
+# user pk → (es manager, versiones, vence)
+_cache = {}
+
+
+def _version_key(user_pk):
+    return f"expenses:roles:user:{user_pk}"
+
+
+def _versions(user_pk):
+    """(época, versión del usuario) del cache compartido (si faltan, se crean)."""
+    keys = [EPOCH_KEY, _version_key(user_pk)]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return tuple(found[key] for key in keys)
+
+
+def _lookup(user):
+    stamp = _versions(user.pk)
+    entry = _cache.get(user.pk)
+    if entry is not None and entry[1] == stamp and entry[2] > time.monotonic():
+        return entry[0]
+    value = user.groups.filter(name__in=MANAGER_GROUPS).exists()
+    _cache[user.pk] = (value, stamp, time.monotonic() + settings.ROLE_CACHE_TTL)
+    return value
+
+
+def is_manager(user):
+    """Superusuario o miembro de Manager/Managers. Una lectura del cache compartido por request."""
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    value = getattr(user, '_expenses_is_manager', None)
+    if value is None:
+        value = _lookup(user)
+        user._expenses_is_manager = value
+    return value
+
+
+def invalidate(user_pk=None):
+    """Olvida el rol de un usuario (o de todos, sin argumento) en todos los procesos."""
+    if user_pk is None:
+        cache.set(EPOCH_KEY, time.time_ns(), None)
+        _cache.clear()
+    else:
+        cache.set(_version_key(user_pk), time.time_ns(), None)
+        _cache.pop(user_pk, None)
+
+
+def roles(request):
+    """Context processor: `is_manager` disponible en todos los templates."""
+    return {'is_manager': is_manager(getattr(request, 'user', None))}
+
+
+# --- Invalidación ---
+@receiver(m2m_changed, sender=User.groups.through)
+def _groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate(instance.pk)               # user.groups.add/remove/clear
+    elif pk_set:
+        for pk in pk_set:                     # group.user_set.add/remove
+            invalidate(pk)
+    else:
+        invalidate()                          # group.user_set.clear(): no sabemos a quiénes
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def _group_changed(sender, **kwargs):
+    invalidate()  # un grupo renombrado/borrado puede cambiar quién es manager
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs):
+    invalidate(instance.pk)
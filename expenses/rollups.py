@@ -0,0 +1,158 @@
+# expenses/rollups.py
+"""
+Mantenimiento incremental de ExpenseRollup.
+
+Cada alta/edición/baja de un Expense aplica un delta (total, count) sobre la
+fila de su clave (mes, obra, usuario, categoría). Los borrados masivos no van
+gasto por gasto: se agrupan con un GROUP BY y se aplica un delta por clave.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ExpenseRollup
+
+_state = threading.local()
+
+
+@contextmanager
+def suspended():
+    """Desactiva los signals de rollup (el llamador aplica los deltas agrupados)."""
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def is_suspended():
+    return getattr(_state, 'suspended', False)
+
+
+def rollup_key(expense):
+    """(mes, obra, usuario, categoría) del gasto, o None si todavía no tiene fecha."""
+    if not expense.date:
+        return None
+    return (expense.date.replace(day=1), expense.project_id, expense.created_by_id, expense.category)
+
+
+def apply_delta(key, total, count):
+    """Suma (total, count) a la fila de `key`; la crea si no existe."""
+    period, project_id, user_id, category = key
+    pk = (
+        ExpenseRollup.objects
+        .filter(period=period, project_id=project_id, user_id=user_id, category=category)
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    if pk is not None:
+        ExpenseRollup.objects.filter(pk=pk).update(total=F('total') + total, count=F('count') + count)
+    else:
+        ExpenseRollup.objects.create(
+            period=period, project_id=project_id, user_id=user_id, category=category,
+            total=total, count=count,
+        )
+
+
+def apply_deltas(deltas):
+    """
+    Igual que apply_delta para muchas claves ({clave: (total, count)}): una sola
+    consulta para ubicar las filas existentes, UPDATE por clave y bulk_create de las nuevas.
+    """
+    if not deltas:
+        return
+    existing = {}
+    rows = (
+        ExpenseRollup.objects.filter(period__in={key[0] for key in deltas})
+        .order_by('-pk').values_list('pk', 'period', 'project_id', 'user_id', 'category')
+    )
+    for pk, *key in rows:
+        existing[tuple(key)] = pk   # orden -pk: queda el pk más chico de cada clave
+    new = []
+    for key, (total, count) in deltas.items():
+        pk = existing.get(key)
+        if pk is not None:
+            ExpenseRollup.objects.filter(pk=pk).update(total=F('total') + total, count=F('count') + count)
+        else:
+            period, project_id, user_id, category = key
+            new.append(ExpenseRollup(period=period, project_id=project_id, user_id=user_id,
+                                     category=category, total=total, count=count))
+    ExpenseRollup.objects.bulk_create(new)
+
+
+ROLLUP_FIELDS = ('date', 'project_id', 'created_by_id', 'category', 'amount')
+
+
+def snapshot(expense):
+    """(clave, monto) tal como está cargado, o None si faltan campos (instancia diferida)."""
+    if not all(f in expense.__dict__ for f in ROLLUP_FIELDS):
+        return None
+    key = rollup_key(expense)
+    return (key, expense.amount) if key and expense.amount is not None else None
+
+
+def stored_snapshot(pk):
+    """Snapshot de lo que está guardado en la BD (para instancias con campos diferidos)."""
+    from .models import Expense
+
+    stored = Expense.objects.filter(pk=pk).only(*ROLLUP_FIELDS).first()
+    return snapshot(stored) if stored else None
+
+
+def expense_changed(old, new):
+    """Aplica el delta entre dos snapshots (cualquiera puede ser None)."""
+    if old == new:
+        return
+    if old:
+        apply_delta(old[0], -old[1], -1)
+    if new:
+        apply_delta(new[0], new[1], 1)
+
+
+def add_expenses(expenses):
+    """Suma a los rollups gastos creados sin signals (bulk_create): un delta por clave."""
+    deltas = {}
+    for e in expenses:
+        key = rollup_key(e)
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + e.amount, count + 1)
+    apply_deltas(deltas)
+
+
+def _grouped(expenses_qs):
+    return (
+        expenses_qs.order_by()
+        .annotate(period=TruncMonth('date'))
+        .values('period', 'project_id', 'created_by_id', 'category')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    )
+
+
+def subtract_queryset(expenses_qs):
+    """Resta de los rollups todo lo de `expenses_qs` (llamar antes de borrarlo)."""
+    apply_deltas({
+        (row['period'], row['project_id'], row['created_by_id'], row['category']): (-row['total'], -row['n'])
+        for row in _grouped(expenses_qs.select_related(None).prefetch_related(None))
+    })
+    # Filas que quedaron en cero no aportan nada
+    ExpenseRollup.objects.filter(count__lte=0).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Recalcula todos los rollups desde la tabla de gastos (una fila por clave)."""
+    from .models import Expense
+
+    ExpenseRollup.objects.all().delete()
+    rows = [
+        ExpenseRollup(
+            period=row['period'], project_id=row['project_id'], user_id=row['created_by_id'],
+            category=row['category'], total=row['total'], count=row['n'],
+        )
+        for row in _grouped(Expense.objects.all()).iterator()
+    ]
+    ExpenseRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,173 @@
+# expenses/search.py
+"""
+Búsqueda de texto en proveedor, descripción y notas con índice full-text.
+
+- Postgres: columna generada `search_vector` (tsvector, pesos A/B/C) con índice GIN.
+- SQLite: tabla FTS5 `expenses_expense_fts` (external content sobre
+  expenses_expense) que mantienen al día triggers de insert/update/delete.
+- Otro motor, o SQLite sin FTS5: icontains (sin índice).
+
+Cada palabra buscada se trata como prefijo ("ferre" encuentra "Ferretería")
+y tienen que aparecer todas. La migración 0010 crea todo; si una migración
+futura rehace la tabla en SQLite (se pierden los triggers), correr
+`manage.py rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'expenses_expense_fts'
+TS_CONFIG = 'spanish'
+MAX_TERMS = 8
+
+_fts_ready = None
+
+
+# --- Instalación (la usan la migración 0010 y rebuild_search_index) ---
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        vendor, description, notes,
+        content='expenses_expense', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, vendor, description, notes)
+        VALUES (new.id, new.vendor, new.description, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, vendor, description, notes)
+        VALUES ('delete', old.id, old.vendor, old.description, old.notes);
+    END""",
+    # Solo si cambia el texto (tocar updated_at no reindexa)
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF vendor, description, notes
+        ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, vendor, description, notes)
+        VALUES ('delete', old.id, old.vendor, old.description, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, vendor, description, notes)
+        VALUES (new.id, new.vendor, new.description, new.notes);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_INSTALL = [
+    f"""ALTER TABLE expenses_expense ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(vendor, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(notes, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS expense_search_idx ON expenses_expense USING gin (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS expense_search_idx",
+    "ALTER TABLE expenses_expense DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def install(conn):
+    """Crea el índice full-text del motor de `conn`. Devuelve False si no hay soporte."""
+    global _fts_ready
+    if conn.vendor == 'postgresql':
+        statements = POSTGRES_INSTALL
+    elif conn.vendor == 'sqlite':
+        statements = SQLITE_INSTALL
+    else:
+        return False
+    with conn.cursor() as cursor:
+        try:
+            for sql in statements:
+                cursor.execute(sql)
+        except Exception:
+            if conn.vendor != 'sqlite':
+                raise
+            return False  # SQLite compilado sin FTS5: queda la búsqueda con icontains
+    _fts_ready = None
+    return True
+
+
+def uninstall(conn):
+    global _fts_ready
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(conn.vendor, [])
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    _fts_ready = None
+
+
+def fts_ready():
+    """¿Hay índice full-text en la base actual? (se mira una vez por proceso)"""
+    global _fts_ready
+    if _fts_ready is None:
+        if connection.vendor == 'sqlite':
+            _fts_ready = FTS_TABLE in connection.introspection.table_names()
+        elif connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'expenses_expense' AND column_name = 'search_vector'"
+                )
+                _fts_ready = cursor.fetchone() is not None
+        else:
+            _fts_ready = False
+    return _fts_ready
+
+
+# --- Consultas ---
+def terms(text):
+    """Palabras de la búsqueda (letras/números), como mucho MAX_TERMS."""
+    return re.findall(r'\w+', text or '')[:MAX_TERMS]
+
+
+def _fts5_query(words):
+    # "palabra"* AND "otra"*: entre comillas no hay sintaxis FTS5 que escapar
+    return ' AND '.join(f'"{w}"*' for w in words)
+
+
+def _tsquery(words):
+    return ' & '.join(f"{w}:*" for w in words)
+
+
+def filter_queryset(qs, text):
+    """Deja solo los gastos que matchean `text` (todas las palabras, como prefijo)."""
+    words = terms(text)
+    if not words:
+        return qs
+    if fts_ready() and connection.vendor == 'sqlite':
+        return qs.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (_fts5_query(words),)
+        ))
+    if fts_ready() and connection.vendor == 'postgresql':
+        return qs.alias(search_match=RawSQL(
+            f"expenses_expense.search_vector @@ to_tsquery('{TS_CONFIG}', %s)",
+            (_tsquery(words),), output_field=BooleanField(),
+        )).filter(search_match=True)
+    for w in words:
+        qs = qs.filter(Q(vendor__icontains=w) | Q(description__icontains=w) | Q(notes__icontains=w))
+    return qs
+
+
+def rank_queryset(qs, text):
+    """Ordena por relevancia (proveedor > descripción > notas), después por fecha."""
+    words = terms(text)
+    if not words or not fts_ready():
+        return qs
+    if connection.vendor == 'sqlite':
+        # bm25: menor es mejor; pesos por columna
+        rank = RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}, 3.0, 2.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = expenses_expense.id)",
+            (_fts5_query(words),), output_field=FloatField(),
+        )
+    else:
+        rank = RawSQL(
+            f"ts_rank(expenses_expense.search_vector, to_tsquery('{TS_CONFIG}', %s))",
+            (_tsquery(words),), output_field=FloatField(),
+        )
+    return qs.annotate(search_rank=rank).order_by('-search_rank', '-date', '-id')
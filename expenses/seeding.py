@@ -0,0 +1,152 @@
+# expenses/seeding.py
+"""
+Datos sintéticos para medir la app a nuestro volumen (manage.py seed_data / benchmark).
+
+Las fotos son JPEG con ruido del tamaño de un recibo ya procesado (≈ 2000 px,
+medio MB). Se generan unas pocas bases y cada recibo lleva unos bytes propios
+al final del archivo (después del marcador de fin del JPEG), así cada uno es un
+archivo distinto en el storage por contenido sin re-encodear miles de imágenes.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from . import list_cache, rollups
+from .models import Expense, Project, Receipt
+
+PROJECT_PREFIX = 'BENCH'
+USER_PREFIX = 'bench'
+SEED_BATCH_SIZE = 2000
+# Imágenes base distintas (generarlas es lo caro; el resto son variantes)
+BASE_IMAGES = 8
+
+CATEGORIES = ['Combustible', 'Materiales', 'Herramientas', 'Comida', 'Peajes', 'Ferretería', 'Fletes']
+VENDORS = ['YPF', 'Shell', 'Axion', 'Easy', 'Sodimac', 'Ferretería Central', 'Corralón Norte', 'AUSA']
+PAYMENTS = [value for value, _ in Expense.PAYMENT_CHOICES]
+
+
+def synthetic_jpeg(width=1500, height=2000, seed=0, quality=80, noise=20):
+    """JPEG gris con gradiente + ruido: comprime como una foto real, no como un color liso."""
+    rng = random.Random(seed)
+    base = Image.linear_gradient('L').rotate(rng.randrange(360)).resize((width, height))
+    img = Image.blend(base, Image.effect_noise((width, height), noise), 0.5).convert('RGB')
+    out = BytesIO()
+    img.save(out, 'JPEG', quality=quality)
+    return out.getvalue()
+
+
+def variant(data, n):
+    """Mismo JPEG con bytes extra al final: los visores los ignoran, el sha256 cambia."""
+    return data + f"seed-{n}".encode()
+
+
+class ImagePool:
+    """Bases generadas una vez + variantes únicas por recibo."""
+    def __init__(self, size=(1500, 2000), count=BASE_IMAGES):
+        self.images = [synthetic_jpeg(*size, seed=i) for i in range(count)]
+        thumb = Image.open(BytesIO(self.images[0]))
+        thumb.thumbnail((320, 320))
+        out = BytesIO()
+        thumb.save(out, 'JPEG', quality=70)
+        self.thumbnail = out.getvalue()
+        self.n = 0
+
+    def next(self):
+        self.n += 1
+        return variant(self.images[self.n % len(self.images)], self.n)
+
+
+def ensure_projects(count):
+    projects = []
+    for i in range(1, count + 1):
+        project, _ = Project.objects.get_or_create(
+            code=f"{PROJECT_PREFIX}-{i:03d}", defaults={'name': f"Obra sintética {i}"}
+        )
+        projects.append(project)
+    return projects
+
+
+def ensure_users(count):
+    users = []
+    for i in range(1, count + 1):
+        user, created = User.objects.get_or_create(username=f"{USER_PREFIX}{i:02d}")
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        users.append(user)
+    return users
+
+
+def random_expense(rng, users, projects, start, days, project_share=0.8):
+    project = rng.choice(projects) if projects and rng.random() < project_share else None
+    return Expense(
+        date=start + timedelta(days=rng.randrange(days)),
+        category=rng.choice(CATEGORIES),
+        vendor=rng.choice(VENDORS),
+        description=f"Ticket {rng.randrange(10**6):06d}",
+        amount=Decimal(rng.randrange(100, 5_000_000)) / 100,
+        payment_method=rng.choice(PAYMENTS),
+        project=project,
+        project_code=project.code if project else '',
+        created_by=rng.choice(users),
+    )
+
+
+def _flush(expenses, receipts_per_expense, pool, rng):
+    """Inserta un lote de gastos (+ rollups) y sus recibos con bulk_create."""
+    receipts = []
+    for e in expenses:
+        # Promedio `receipts_per_expense` (p. ej. 1.5 → 1 o 2 por gasto)
+        count = int(receipts_per_expense) + (rng.random() < receipts_per_expense % 1)
+        for j in range(count):
+            r = Receipt(
+                image=ContentFile(pool.next(), name=f"ticket-{j + 1}.jpg"),
+                thumbnail=ContentFile(pool.thumbnail, name='ticket.jpg'),
+                processed=True, original_name=f"IMG_{rng.randrange(10**4):04d}.jpg",
+            )
+            r.store_files()
+            receipts.append((e, r))
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses)
+        rollups.add_expenses(expenses)  # bulk_create no dispara signals
+        for e, r in receipts:
+            r.expense = e
+        Receipt.objects.bulk_create([r for _, r in receipts])
+    list_cache.bump([e.created_by_id for e in expenses])
+    return len(receipts)
+
+
+def seed(expenses, projects=10, users=5, receipts_per_expense=1.0, image_size=(1500, 2000),
+         start=None, days=730, rng_seed=0, pool=None, owner=None, project=None, progress=None):
+    """
+    Crea `expenses` gastos repartidos en `days` días. Con `owner`/`project` van
+    todos a ese usuario/obra (lo usa el benchmark para armar datos descartables).
+    Devuelve (gastos, recibos) creados.
+    """
+    rng = random.Random(rng_seed)
+    start = start or date.today() - timedelta(days=days)
+    project_list = [project] if project else ensure_projects(projects)
+    user_list = [owner] if owner else ensure_users(users)
+    if pool is None and receipts_per_expense:
+        pool = ImagePool(image_size)
+
+    created = receipts = 0
+    batch = []
+    for _ in range(expenses):
+        batch.append(random_expense(rng, user_list, project_list, start, days, 1 if project else 0.8))
+        if len(batch) >= SEED_BATCH_SIZE:
+            receipts += _flush(batch, receipts_per_expense, pool, rng)
+            created += len(batch)
+            batch = []
+            if progress:
+                progress(created, receipts)
+    if batch:
+        receipts += _flush(batch, receipts_per_expense, pool, rng)
+        created += len(batch)
+    return created, receipts
@@ -0,0 +1,147 @@
+# expenses/serving.py
+"""
+Entrega de archivos de recibos con permisos.
+
+Django solo decide (permiso, ETag, 304); los bytes los manda el servidor de
+adelante cuando RECEIPT_SERVE_MODE lo permite:
+- 'x-accel'    → nginx: X-Accel-Redirect a RECEIPT_ACCEL_PREFIX + nombre (location internal).
+- 'x-sendfile' → Apache mod_xsendfile / lighttpd: X-Sendfile con la ruta en disco.
+- 'django'     → streaming desde el storage, con soporte de Range (206) propio.
+
+Los blobs tienen el sha256 en el nombre: el ETag es el hash y nunca cambian
+(Cache-Control immutable), así que las vistas repetidas terminan en 304 sin
+abrir el archivo.
+"""
+import hashlib
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+from . import aio
+from .blobs import BLOB_PREFIX, THUMB_PREFIX, is_blob_name
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 3600
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def content_addressed(name):
+    """Imagen o miniatura guardada por contenido (nombre = sha256): nunca cambia."""
+    return is_blob_name(name, BLOB_PREFIX) or is_blob_name(name, THUMB_PREFIX)
+
+
+def etag_for(storage, name):
+    """ETag fuerte: el sha256 del nombre si es un blob, si no nombre + tamaño + mtime."""
+    if content_addressed(name):
+        return '"' + name.rsplit('/', 1)[-1].split('.')[0] + '"'
+    stamp = f"{name}:{storage.size(name)}:{storage.get_modified_time(name).timestamp()}"
+    return f'"{hashlib.sha256(stamp.encode()).hexdigest()[:32]}"'
+
+
+def _cache_headers(response, etag, immutable):
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f"private, max-age={IMMUTABLE_MAX_AGE}, immutable" if immutable
+        else f"private, max-age={MUTABLE_MAX_AGE}"
+    )
+    return response
+
+
+def _parse_range(header, size):
+    """(inicio, fin) inclusivos de un único rango, None si no aplica, False si es insatisfacible."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None  # sintaxis que no manejamos (p. ej. varios rangos): se manda todo
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # bytes=-N: los últimos N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def serve(request, storage, name, filename=None):
+    """Respuesta para el archivo `name` de `storage` (el permiso ya se chequeó)."""
+    try:
+        return _serve(request, storage, name, filename)
+    except OSError:
+        # Recibo cuya fila existe pero el archivo no está (o no se puede leer) en el storage
+        raise Http404('Archivo no encontrado.')
+
+
+def _serve(request, storage, name, filename):
+    immutable = content_addressed(name)
+    etag = etag_for(storage, name)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return _cache_headers(HttpResponseNotModified(), etag, immutable)
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    disposition = f"inline; filename*=UTF-8''{quote(filename)}" if filename else 'inline'
+    mode = settings.RECEIPT_SERVE_MODE
+
+    if mode in ('x-accel', 'x-sendfile'):
+        # El front server manda el archivo (y resuelve Range); el worker queda libre enseguida
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            response['X-Accel-Redirect'] = settings.RECEIPT_ACCEL_PREFIX.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        response['Content-Disposition'] = disposition
+        return _cache_headers(response, etag, immutable)
+
+    size = storage.size(name)
+    byte_range = None
+    if 'Range' in request.headers:
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag:
+            byte_range = _parse_range(request.headers['Range'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return _cache_headers(response, etag, immutable)
+
+    f = storage.open(name, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(f, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(f, content_type=content_type)
+        response['Content-Length'] = str(size)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = disposition
+    return _cache_headers(response, etag, immutable)
+
+
+async def aserve(request, storage, name, filename=None):
+    """serve() para vistas async: stat/open en el pool de storage y el cuerpo se lee de a bloques ahí."""
+    response = await aio.run_io(serve, request, storage, name, filename)
+    if response.streaming and not response.is_async:
+        response.streaming_content = aio.iterate_io(response.streaming_content)
+    return response
@@ -0,0 +1,98 @@
+# expenses/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import list_cache, rollups, suggest
+from .models import Expense, Project, Receipt
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+def touch_expense_on_receipt_change(sender, instance, origin=None, **kwargs):
+    """Un recibo nuevo/borrado cuenta como cambio del gasto (updated_at)."""
+    if origin is not None and getattr(origin, 'model', type(origin)) is Expense:
+        return  # se borra el gasto entero (cascada): no hay nada que tocar
+    Expense.objects.filter(pk=instance.expense_id).update(updated_at=timezone.now())
+
+
+# --- Rollups: antes de guardar/borrar leemos cómo estaba el gasto para aplicar solo el delta ---
+# (a demanda: cargar gastos en la lista, el export o el benchmark no arma snapshots)
+def _touches_rollups(update_fields):
+    """save(update_fields=...) que no toca fecha/obra/usuario/categoría/monto no mueve los rollups."""
+    if update_fields is None:
+        return True
+    return any(f in rollups.ROLLUP_FIELDS or f"{f}_id" in rollups.ROLLUP_FIELDS for f in update_fields)
+
+
+@receiver(pre_save, sender=Expense)
+def load_rollup_snapshot(sender, instance, update_fields=None, **kwargs):
+    """Lo guardado en la BD antes de este save (un SELECT por pk)."""
+    if instance.pk and not instance._state.adding and not rollups.is_suspended() and _touches_rollups(update_fields):
+        instance._rollup_snapshot = rollups.stored_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=Expense)
+def update_rollups_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if rollups.is_suspended() or not _touches_rollups(update_fields):
+        return
+    new = rollups.snapshot(instance)
+    if new is None and instance.pk:
+        new = rollups.stored_snapshot(instance.pk)  # guardado con campos diferidos
+    rollups.expense_changed(None if created else instance.__dict__.pop('_rollup_snapshot', None), new)
+
+
+@receiver(pre_delete, sender=Expense)
+def load_rollup_snapshot_for_delete(sender, instance, **kwargs):
+    """Instancia completa: sus valores; cargada con only()/defer(): lo guardado en la BD."""
+    if instance.pk and not rollups.is_suspended():
+        instance._rollup_snapshot = rollups.snapshot(instance) or rollups.stored_snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    if rollups.is_suspended():
+        return
+    rollups.expense_changed(instance.__dict__.pop('_rollup_snapshot', None), None)
+
+
+# --- Sugerencias de proveedor/categoría: los valores nuevos entran al índice en memoria ---
+@receiver(post_save, sender=Expense)
+def add_to_suggestions(sender, instance, created, **kwargs):
+    suggest.add_expenses([instance], 1 if created else 0)
+
+
+# --- Cache de la lista: nueva versión para el dueño y para los managers ---
+# Con rollups suspendidos (borrado por lotes) el llamador llama a list_cache.bump una vez.
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def bump_list_on_expense_change(sender, instance, **kwargs):
+    if rollups.is_suspended():
+        return
+    if 'created_by_id' in instance.__dict__:
+        list_cache.bump([instance.created_by_id])
+    else:
+        list_cache.bump()   # cargado sin created_by (only/defer) y ya borrado: no sabemos el dueño
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+def bump_list_on_receipt_change(sender, instance, origin=None, **kwargs):
+    if origin is not None and getattr(origin, 'model', type(origin)) is Expense:
+        return  # cascada del borrado del gasto: ya cuenta ese cambio
+    if rollups.is_suspended():
+        return
+    owner = Expense.objects.filter(pk=instance.expense_id).values_list('created_by_id', flat=True).first()
+    list_cache.bump([owner])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_list_on_label_change(sender, update_fields=None, **kwargs):
+    """La tabla muestra código de obra y nombre de usuario."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    list_cache.bump()
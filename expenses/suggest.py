@@ -0,0 +1,104 @@
+# expenses/suggest.py
+"""
+Sugerencias de proveedor y categoría mientras se escribe.
+
+Por proceso se arma un índice en memoria con los valores distintos y cuántas
+veces se usó cada uno (un GROUP BY por campo). Las claves se normalizan (sin
+tildes, minúsculas) y se guardan ordenadas, así un prefijo es una búsqueda
+binaria; de cada clave se sugiere la variante más usada ("YPF" y no "ypf ").
+
+Los gastos nuevos se suman al índice al guardarse (signal y caminos con
+bulk_create); el índice se rearma entero cada SUGGEST_INDEX_TTL segundos para
+alinear borrados y lo cargado desde otros procesos.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Expense
+
+FIELDS = ('vendor', 'category')
+SUGGEST_RESULTS = 10
+
+
+def normalize(value):
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode()
+    return ' '.join(value.lower().split())
+
+
+class PrefixIndex:
+    """Claves normalizadas ordenadas + frecuencia de cada variante escrita."""
+    def __init__(self, counts=()):
+        self.variants = {}   # clave → {valor tal cual: usos}
+        self.totals = {}     # clave → usos
+        for value, n in counts:
+            self._count(value, n)
+        self.keys = sorted(self.totals)
+        self.lock = threading.Lock()
+
+    def _count(self, value, n):
+        key = normalize(value)
+        if not key:
+            return None
+        variants = self.variants.setdefault(key, {})
+        variants[value.strip()] = variants.get(value.strip(), 0) + n
+        new = key not in self.totals
+        self.totals[key] = self.totals.get(key, 0) + n
+        return key if new else None
+
+    def add(self, value, n=1):
+        with self.lock:
+            key = self._count(value, n)
+            if key is not None:
+                insort(self.keys, key)
+
+    def search(self, prefix, limit=SUGGEST_RESULTS):
+        """Los `limit` valores más usados que empiezan con `prefix`."""
+        prefix = normalize(prefix)
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\uffff', lo) if prefix else len(self.keys)
+        best = heapq.nlargest(limit, self.keys[lo:hi], key=self.totals.__getitem__)
+        return [max(self.variants[key].items(), key=lambda item: item[1])[0] for key in best]
+
+
+_indexes = {}   # campo → (PrefixIndex, vence)
+_build_lock = threading.Lock()
+
+
+def build(field):
+    rows = Expense.objects.order_by().values_list(field).annotate(n=Count('id'))
+    return PrefixIndex((value, n) for value, n in rows if value)
+
+
+def get_index(field):
+    entry = _indexes.get(field)
+    if entry is None or entry[1] <= time.monotonic():
+        with _build_lock:
+            entry = _indexes.get(field)
+            if entry is None or entry[1] <= time.monotonic():
+                entry = (build(field), time.monotonic() + settings.SUGGEST_INDEX_TTL)
+                _indexes[field] = entry
+    return entry[0]
+
+
+def search(field, prefix):
+    return get_index(field).search(prefix)
+
+
+def add_expenses(expenses, n=1):
+    """
+    Suma gastos recién guardados a los índices ya armados (no fuerza armarlos).
+    Con n=0 (ediciones) solo agrega los valores nuevos, sin contar un uso más.
+    """
+    for field in FIELDS:
+        entry = _indexes.get(field)
+        if entry is None:
+            continue
+        for e in expenses:
+            if getattr(e, field):
+                entry[0].add(getattr(e, field), n)
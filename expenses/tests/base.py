@@ -0,0 +1,61 @@
+# expenses/tests/base.py
+"""Datos y storage compartidos por los tests (media en un directorio temporal)."""
+import datetime
+import functools
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from expenses.models import Expense, Receipt
+from expenses.seeding import synthetic_jpeg
+
+
+@functools.lru_cache(maxsize=None)
+def jpeg(seed=0):
+    """JPEG chico; el mismo seed da los mismos bytes (el ruido de synthetic_jpeg no es determinista)."""
+    return synthetic_jpeg(40, 40, seed=seed)
+
+
+class MediaTestCase(TestCase):
+    """TestCase con MEDIA_ROOT y cache de exports propios, borrados al terminar."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media = tempfile.mkdtemp()
+        cls._settings = override_settings(
+            MEDIA_ROOT=cls._media, EXPORT_CACHE_DIR=f"{cls._media}/exports",
+        )
+        cls._settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._settings.disable()
+        shutil.rmtree(cls._media, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def make_user(username):
+        return User.objects.create_user(username, password='x')
+
+    @staticmethod
+    def make_expense(user, amount='10.00', date=None, **kwargs):
+        fields = {
+            'date': date or datetime.date(2026, 5, 10), 'category': 'Materiales', 'vendor': 'Proveedor',
+            'amount': Decimal(amount), 'payment_method': 'cash', 'created_by': user,
+        }
+        fields.update(kwargs)
+        return Expense.objects.create(**fields)
+
+    @staticmethod
+    def make_receipt(expense, seed=0):
+        image = ContentFile(jpeg(seed), name='recibo.jpg')
+        return Receipt.objects.create(expense=expense, image=image, original_name='recibo.jpg')
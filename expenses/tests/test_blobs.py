@@ -0,0 +1,67 @@
+# expenses/tests/test_blobs.py
+import os
+import time
+
+from django.core.files.base import ContentFile
+
+from expenses.blobs import delete_if_unreferenced, is_blob_name, recently_stored, store_blob
+from expenses.deletion import delete_expenses, process_pending_files
+from expenses.models import Expense, PendingFileDeletion, Receipt
+from .base import MediaTestCase, jpeg
+
+
+class BlobTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('op')
+        self.storage = Receipt._meta.get_field('image').storage
+
+    def _age(self, name, seconds=7200):
+        old = time.time() - seconds
+        os.utime(self.storage.path(name), (old, old))
+
+    def test_same_content_is_stored_once(self):
+        a = self.make_receipt(self.make_expense(self.user), seed=1)
+        b = self.make_receipt(self.make_expense(self.user), seed=1)
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertTrue(is_blob_name(a.image.name))
+        self.assertEqual(len(a.sha256), 64)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.storage.path(a.image.name)))), 1)
+
+    def test_gc_keeps_shared_blob_until_last_receipt_is_gone(self):
+        e1, e2 = self.make_expense(self.user), self.make_expense(self.user)
+        name = self.make_receipt(e1, seed=2).image.name
+        self.make_receipt(e2, seed=2)
+        self._age(name)
+
+        delete_expenses(Expense.objects.filter(pk=e1.pk))
+        process_pending_files()
+        self.assertTrue(self.storage.exists(name))
+
+        delete_expenses(Expense.objects.filter(pk=e2.pk))
+        self.assertEqual(process_pending_files(), 1)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_gc_skips_blob_reused_by_upload_in_progress(self):
+        data = jpeg(3)
+        name, _ = store_blob(self.storage, ContentFile(data, name='a.jpg'))
+        self._age(name)
+        PendingFileDeletion.objects.create(name=name)
+        # Una subida reusa el blob antes de crear su fila
+        reused, _ = store_blob(self.storage, ContentFile(data, name='b.jpg'))
+        self.assertEqual(reused, name)
+        self.assertTrue(recently_stored(self.storage, name))
+
+        self.assertEqual(process_pending_files(), 0)
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(PendingFileDeletion.objects.filter(name=name).exists())
+
+    def test_delete_if_unreferenced_queues_recent_files(self):
+        name, _ = store_blob(self.storage, ContentFile(jpeg(4), name='a.jpg'))
+        self.assertFalse(delete_if_unreferenced(self.storage, name))
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(PendingFileDeletion.objects.filter(name=name).exists())
+        self.assertEqual(process_pending_files(grace=0), 1)
+        self.assertFalse(self.storage.exists(name))
@@ -0,0 +1,60 @@
+# expenses/tests/test_delta.py
+import io
+import json
+import zipfile
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import DeltaExport, Expense
+
+from .base import MediaTestCase
+
+
+@override_settings(DELTA_EXPORT_MARGIN_SECONDS=60)
+class DeltaWatermarkTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('op')
+        self.client.force_login(self.user)
+
+    def _backdate(self, expense, seconds=120):
+        Expense.objects.filter(pk=expense.pk).update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def _manifest(self, query=''):
+        resp = self.client.get(reverse('export-delta') + query)
+        self.assertEqual(resp.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(resp.streaming_content))) as z:
+            return json.loads(z.read('manifest.json'))
+
+    def test_each_export_brings_only_what_is_new(self):
+        first = self.make_expense(self.user)
+        self._backdate(first)
+        self.assertEqual(self._manifest()['expenses'], [first.pk])
+        self.assertEqual(self._manifest()['expenses'], [])
+
+        second = self.make_expense(self.user)
+        self._backdate(second)
+        self.assertEqual(self._manifest()['expenses'], [second.pk])
+        self.assertEqual(DeltaExport.objects.filter(user=self.user).count(), 3)
+
+    def test_repeat_regenerates_last_range(self):
+        e = self.make_expense(self.user)
+        self._backdate(e)
+        self._manifest()
+        self.assertEqual(self._manifest('?repetir=1')['expenses'], [e.pk])
+        self.assertEqual(DeltaExport.objects.filter(user=self.user).count(), 1)
+
+    def test_rows_inside_the_margin_wait_for_the_next_export(self):
+        old = self.make_expense(self.user)
+        self._backdate(old, 300)
+        # Fila de una transacción que commitea tarde: created_at anterior al export, dentro del margen
+        late = self.make_expense(self.user)
+        self._backdate(late, 30)
+        self.assertEqual(self._manifest()['expenses'], [old.pk])
+
+        with override_settings(DELTA_EXPORT_MARGIN_SECONDS=10):
+            self.assertEqual(self._manifest()['expenses'], [late.pk])
@@ -0,0 +1,39 @@
+# expenses/tests/test_export_cache.py
+import os
+
+from django.test import override_settings
+
+from expenses import export_cache
+
+from .base import MediaTestCase
+
+
+class ExportCacheTests(MediaTestCase):
+
+    def test_store_then_get(self):
+        body = b''.join(export_cache.store('k1', [b'abc', b'def']))
+        self.assertEqual(body, b'abcdef')
+        with export_cache.get('k1') as f:
+            self.assertEqual(f.read(), b'abcdef')
+        self.assertIsNone(export_cache.get('k2'))
+
+    def test_incomplete_stream_is_not_published(self):
+        chunks = export_cache.store('k1', iter([b'a', b'b']))
+        next(chunks)
+        chunks.close()
+        self.assertIsNone(export_cache.get('k1'))
+        self.assertEqual([p for p in os.listdir(export_cache._cache_dir()) if p.endswith('.part')], [])
+
+    def test_file_evicted_after_get_is_still_readable(self):
+        b''.join(export_cache.store('k1', [b'x' * 1000]))
+        f = export_cache.get('k1')
+        os.unlink(f.name)
+        with f:
+            self.assertEqual(len(f.read()), 1000)
+        self.assertIsNone(export_cache.get('k1'))
+
+    @override_settings(EXPORT_CACHE_MAX_MB=1)
+    def test_oversized_export_streams_without_caching(self):
+        body = b''.join(export_cache.store('big', (b'x' * 400_000 for _ in range(3))))
+        self.assertEqual(len(body), 1_200_000)
+        self.assertIsNone(export_cache.get('big'))
@@ -0,0 +1,49 @@
+# expenses/tests/test_importer.py
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.test import TestCase
+
+from expenses.importer import import_expenses
+from expenses.models import Expense, ExpenseRollup, Project
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('op')
+        self.project = Project.objects.create(name='Obra Norte', code='ON-1')
+
+    def _import(self, text, **kwargs):
+        return import_expenses(io.BytesIO(text.encode()), 'gastos.csv', self.user, **kwargs)
+
+    def test_valid_rows_in_batches_with_rollups(self):
+        result = self._import(
+            "Fecha,Categoría,Proveedor,Monto,Medio de pago,Obra\n"
+            "10/05/2026,Materiales,Easy,\"1.234,50\",Efectivo,ON-1\n"
+            "2026-05-11,Combustible,YPF,100,cash,\n"
+            "12/05/2026,Materiales,Easy,50.25,,obra norte\n",
+            batch_size=2,
+        )
+        self.assertEqual((result.created, result.error_count), (3, 0))
+        self.assertEqual(Expense.objects.filter(project=self.project).count(), 2)
+        self.assertEqual(Expense.objects.aggregate(t=Sum('amount'))['t'], Decimal('1384.75'))
+        self.assertEqual(ExpenseRollup.objects.aggregate(t=Sum('total'))['t'], Decimal('1384.75'))
+
+    def test_errors_are_reported_by_line(self):
+        result = self._import(
+            "Fecha,Categoría,Proveedor,Monto,Obra\n"
+            "10/05/2026,Materiales,Easy,-5,\n"
+            "\n"
+            "11/05/2026,Materiales,Easy,10,Inexistente\n"
+            "12/05/2026,Materiales,Easy,10,\n"
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 4])
+
+    def test_missing_required_columns(self):
+        result = self._import("Proveedor,Categoría\nEasy,Materiales\n")
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors[0][0], 1)
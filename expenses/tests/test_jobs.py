@@ -0,0 +1,34 @@
+# expenses/tests/test_jobs.py
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from django.contrib.auth.models import User
+
+from expenses.jobs import claim_next_job
+from expenses.models import ExportJob
+
+
+@override_settings(EXPORT_JOB_TIMEOUT_MINUTES=30)
+class ClaimJobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('op')
+
+    def test_claims_oldest_pending_once(self):
+        first = ExportJob.objects.create(created_by=self.user)
+        ExportJob.objects.create(created_by=self.user)
+        job = claim_next_job()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.status, 'running')
+        self.assertNotEqual(claim_next_job().pk, first.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_running_job_is_requeued(self):
+        stale = ExportJob.objects.create(created_by=self.user, status='running',
+                                         started_at=timezone.now() - timedelta(minutes=31), rows_done=5)
+        ExportJob.objects.create(created_by=self.user, status='running', started_at=timezone.now())
+        job = claim_next_job()
+        self.assertEqual(job.pk, stale.pk)
+        self.assertEqual(job.rows_done, 0)
@@ -0,0 +1,80 @@
+# expenses/tests/test_rollups.py
+import datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from expenses import rollups
+from expenses.deletion import delete_expenses
+from expenses.models import Expense, ExpenseRollup, Project
+
+from .base import MediaTestCase
+
+
+class RollupConsistencyTests(MediaTestCase):
+    """Los rollups incrementales tienen que coincidir siempre con recalcularlos desde cero."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('op')
+        self.project = Project.objects.create(name='Obra 1', code='O1')
+
+    def assertConsistent(self):
+        incremental = {
+            (r['period'], r['project_id'], r['user_id'], r['category']): (r['t'], r['n'])
+            for r in ExpenseRollup.objects.values('period', 'project_id', 'user_id', 'category')
+            .annotate(t=Sum('total'), n=Sum('count')) if r['n']
+        }
+        expected = {
+            (r['period'], r['project_id'], r['created_by_id'], r['category']): (r['total'], r['n'])
+            for r in rollups._grouped(Expense.objects.all())
+        }
+        self.assertEqual(incremental, expected)
+
+    def test_create_edit_delete(self):
+        e = self.make_expense(self.user, '100.00')
+        self.assertConsistent()
+        e.amount = Decimal('150.00')
+        e.project = self.project
+        e.date = datetime.date(2026, 6, 1)
+        e.save()
+        self.assertConsistent()
+        e.delete()
+        self.assertConsistent()
+        self.assertFalse(ExpenseRollup.objects.filter(count__gt=0).exists())
+
+    def test_deferred_instances(self):
+        e = self.make_expense(self.user, '40.00')
+        d = Expense.objects.only('id', 'vendor').get(pk=e.pk)
+        d.amount = Decimal('70.00')
+        d.save()
+        self.assertConsistent()
+        Expense.objects.only('id').get(pk=e.pk).delete()
+        self.assertConsistent()
+
+    def test_save_without_rollup_fields_does_not_read_snapshot(self):
+        e = self.make_expense(self.user)
+        e.description = 'otro detalle'
+        with CaptureQueriesContext(connection) as queries:
+            e.save(update_fields=['description'])
+        self.assertEqual([q['sql'] for q in queries if 'expenses_expense' in q['sql']],
+                         [queries[0]['sql']])   # solo el UPDATE
+        self.assertFalse(any('expenses_expenserollup' in q['sql'] for q in queries))
+        self.assertConsistent()
+
+    def test_batch_delete(self):
+        for i in range(5):
+            self.make_expense(self.user, f"{i + 1}.00", project=self.project if i % 2 else None)
+        self.assertEqual(delete_expenses(Expense.objects.filter(project=self.project), batch_size=1), 2)
+        self.assertConsistent()
+
+    def test_bulk_created_expenses(self):
+        expenses = Expense.objects.bulk_create([
+            Expense(date=datetime.date(2026, 5, i + 1), category='Lote', vendor='V', amount=Decimal('5.00'),
+                    payment_method='cash', created_by=self.user)
+            for i in range(3)
+        ])
+        rollups.add_expenses(expenses)
+        self.assertConsistent()
@@ -0,0 +1,55 @@
+# expenses/tests/test_serving.py
+from django.urls import reverse
+
+from expenses.models import Receipt
+
+from .base import MediaTestCase
+
+
+class ReceiptServingTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('op')
+        self.receipt = self.make_receipt(self.make_expense(self.user), seed=5)
+        self.url = reverse('receipt-file', args=[self.receipt.pk])
+        self.size = self.receipt.image.size
+        self.client.force_login(self.user)
+
+    def test_full_response_with_etag(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['ETag'], f'"{self.receipt.sha256}"')
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertEqual(len(b''.join(resp.streaming_content)), self.size)
+
+    def test_if_none_match_returns_304(self):
+        resp = self.client.get(self.url, headers={'If-None-Match': f'"{self.receipt.sha256}"'})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_range(self):
+        resp = self.client.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp['Content-Range'], f"bytes 10-19/{self.size}")
+        with self.receipt.image.open('rb') as f:
+            f.seek(10)
+            self.assertEqual(b''.join(resp.streaming_content), f.read(10))
+
+    def test_suffix_range_and_unsatisfiable(self):
+        resp = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(len(b''.join(resp.streaming_content)), 5)
+        resp = self.client.get(self.url, headers={'Range': f'bytes={self.size}-'})
+        self.assertEqual(resp.status_code, 416)
+
+    def test_stale_if_range_sends_everything(self):
+        resp = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"otro"'})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_other_users_receipt_is_404(self):
+        self.client.force_login(self.make_user('otro'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_missing_file_is_404(self):
+        Receipt.objects.filter(pk=self.receipt.pk).update(image='receipts/originals/no-existe.jpg')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
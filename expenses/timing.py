@@ -0,0 +1,187 @@
+# expenses/timing.py
+"""
+Instrumentación por request: cantidad de queries, tiempo de BD, queries más
+lentas, render de template y fases del export (Excel / lectura de recibos).
+
+Se prende con SERVER_TIMING = True. Sale como header `Server-Timing` (lo
+muestran las devtools del navegador) y como una línea de log JSON en el logger
+`expenses.timing`. Apagado, el middleware ni se instala (MiddlewareNotUsed) y
+`phase()` / `timed_iter()` solo miran una ContextVar vacía.
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Queries más lentas que se guardan por request (solo van al log, nunca al header)
+SLOW_QUERIES = 3
+SQL_MAX_CHARS = 300
+
+_current = ContextVar('expenses_timings', default=None)
+
+
+class Timings:
+    """Acumulador de un request: métricas en ms + top de queries lentas."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.slow = []          # heap de (ms, sql)
+        self.phases = {}        # nombre → ms
+
+    def add(self, name, ms):
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def total(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper de Django: mide cada query."""
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.queries += 1
+            self.db += ms
+            item = (ms, sql[:SQL_MAX_CHARS])
+            if len(self.slow) < SLOW_QUERIES:
+                heapq.heappush(self.slow, item)
+            elif ms > self.slow[0][0]:
+                heapq.heapreplace(self.slow, item)
+
+    def header(self, total=None):
+        parts = [f'db;dur={self.db:.1f};desc="{self.queries} queries"']
+        parts += [f'{name};dur={ms:.1f}' for name, ms in self.phases.items()]
+        parts.append(f'total;dur={self.total() if total is None else total:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total(), 1),
+            'db_ms': round(self.db, 1),
+            'queries': self.queries,
+            **{f'{name}_ms': round(ms, 1) for name, ms in self.phases.items()},
+            'slow': [{'ms': round(ms, 1), 'sql': sql} for ms, sql in sorted(self.slow, reverse=True)],
+        }
+
+
+def current():
+    """Timings del request en curso o None (instrumentación apagada / fuera de un request)."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """Suma la duración del bloque a la métrica `name` del request en curso."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def timed_iter(name, iterable):
+    """Igual que `iterable`, pero suma a `name` el tiempo de espera de cada next()."""
+    timings = _current.get()
+    if timings is None:
+        return iterable
+    return _timed_iter(name, iter(iterable), timings)
+
+
+def _timed_iter(name, iterator, timings):
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings.add(name, (time.perf_counter() - t0) * 1000)
+        yield item
+
+
+@contextmanager
+def _activate(timings):
+    """Instala el execute_wrapper en todas las conexiones y publica los Timings."""
+    token = _current.set(timings)
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timings))
+            yield
+    finally:
+        _current.reset(token)
+
+
+class ServerTimingMiddleware:
+    """
+    Mide cada request y agrega `Server-Timing`. Con respuestas en streaming
+    (export ZIP) el header solo puede llevar lo medido hasta que arrancan los
+    bytes; el resto (armado del Excel, lectura de recibos) va a la línea de
+    log que se escribe cuando termina el stream.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        with _activate(timings):
+            response = self.get_response(request)
+
+        response['Server-Timing'] = timings.header()
+        if response.streaming:
+            stream = self._astream if response.is_async else self._stream
+            response.streaming_content = stream(response.streaming_content, timings, request, response)
+        else:
+            self._log(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # Renderizamos acá para poder medirlo (TemplateResponse no re-renderiza después)
+        timings = _current.get()
+        if timings is not None:
+            with phase('tpl'):
+                response.render()
+        return response
+
+    def _stream(self, content, timings, request, response):
+        t0 = time.perf_counter()
+        try:
+            with _activate(timings):
+                yield from content
+        finally:
+            timings.add('stream', (time.perf_counter() - t0) * 1000)
+            self._log(request, response, timings)
+
+    async def _astream(self, content, timings, request, response):
+        t0 = time.perf_counter()
+        try:
+            with _activate(timings):
+                async for chunk in content:
+                    yield chunk
+        finally:
+            timings.add('stream', (time.perf_counter() - t0) * 1000)
+            self._log(request, response, timings)
+
+    def _log(self, request, response, timings):
+        logger.info("timing %s", json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.as_dict(),
+        }, ensure_ascii=False))
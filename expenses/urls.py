@@ -1,11 +1,43 @@
+from django.conf import settings
 from django.urls import path
-from .views import ExpenseCreateView, ExpenseListView, export_zip
+from .views import ExpenseCreateView, ExpenseBatchCreateView, ExpenseListView, export_zip
+from .views import export_zip_parts, export_zip_part, export_data, export_delta
 from .views import delete_expense, bulk_delete_expenses
+from .views import export_job_create, export_job_status, export_job_download
+from .views import expense_summary, expense_import, autocomplete, receipt_file
+
+expense_create = ExpenseCreateView.as_view()
+if settings.ASYNC_VIEWS:
+    # Bajo ASGI: carga, export ZIP y recibos sin bloquear un worker (ver async_views.py)
+    from . import async_views
+    expense_create = async_views.ExpenseCreateView.as_view()
+    export_zip = async_views.export_zip
+    receipt_file = async_views.receipt_file
+    # Streaming sync: bajo ASGI se consumiría entero en memoria antes de mandar el primer byte
+    export_delta = async_views.async_streaming(export_delta)
+    export_zip_part = async_views.async_streaming(export_zip_part)
+    export_data = async_views.async_streaming(export_data)
+    export_job_download = async_views.async_streaming(export_job_download)
 
 urlpatterns = [
-    path('', ExpenseCreateView.as_view(), name='expense-create'),
+    path('', expense_create, name='expense-create'),
+    path('lote/', ExpenseBatchCreateView.as_view(), name='expense-batch-create'),
     path('gastos/', ExpenseListView.as_view(), name='expense-list'),
+    path('gastos/importar/', expense_import, name='expense-import'),
+    path('resumen/', expense_summary, name='expense-summary'),
+    path('autocomplete/<str:kind>/', autocomplete, name='autocomplete'),
+    path('recibos/<int:pk>/', receipt_file, name='receipt-file'),
+    path('recibos/<int:pk>/miniatura/', receipt_file, {'variant': 'thumbnail'}, name='receipt-thumbnail'),
     path('export/zip/', export_zip, name='export-zip'),
+    path('export/zip/novedades/', export_delta, name='export-delta'),
+    path('export/zip/partes/', export_zip_parts, name='export-zip-parts'),
+    path('export/zip/parte/', export_zip_part, name='export-zip-part'),
+    path('export/csv/', export_data, {'fmt': 'csv'}, name='export-csv'),
+    path('export/parquet/', export_data, {'fmt': 'parquet'}, name='export-parquet'),
+    path('export/arrow/', export_data, {'fmt': 'arrow'}, name='export-arrow'),
+    path('export/jobs/', export_job_create, name='export-job-create'),
+    path('export/jobs/<int:pk>/', export_job_status, name='export-job-status'),
+    path('export/jobs/<int:pk>/download/', export_job_download, name='export-job-download'),
     
     path('gastos/<int:pk>/delete/', delete_expense, name='expense-delete'),
     path('gastos/bulk-delete/', bulk_delete_expenses, name='expense-bulk-delete'), 
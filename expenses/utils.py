@@ -1,8 +1,26 @@
-from io import BytesIO
-from zipfile import ZipFile, ZIP_DEFLATED
+import csv
+import datetime
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
-from django.utils.text import slugify
+from django.conf import settings
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+# Parquet/Arrow es opcional (pip install pyarrow); sin él esos formatos no se ofrecen
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from . import timing
+from .models import Expense, Project, Receipt
 
 HEADERS = [
     'ID','Fecha','Categoría','Proveedor','Descripción','Monto','Medio de pago','Código/Obra','Notas','Recibos (links)'
@@ -10,43 +28,399 @@ HEADERS = [
 
 COL_WIDTHS = [6,12,18,24,36,12,16,16,24,30]
 
-def build_export(expenses_qs):
-    # 1) Excel in-memory
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Gastos'
+# Tamaño de cada bloque que se copia al ZIP (no leemos archivos enteros a memoria)
+CHUNK_SIZE = 64 * 1024
+# Gastos por lote al leer de la BD (iterator + prefetch de recibos por lote)
+EXPORT_CHUNK_SIZE = 2000
+# El Excel queda en memoria hasta este tamaño; si crece, pasa a disco
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024
+# Cada cuántas filas se informa avance al callback `progress`
+PROGRESS_EVERY = 500
+# Formatos que ya vienen comprimidos: van al ZIP sin DEFLATE (ZIP_STORED)
+COMPRESSED_EXTS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'heic', 'heif', 'avif', 'zip', 'gz'}
 
-    ws.append(HEADERS)
+
+class _ZipStream:
+    """
+    Destino "file-like" no seekable para ZipFile: acumula lo escrito hasta que
+    el generador lo saca con pop(). ZipFile detecta que no puede hacer seek y
+    escribe data descriptors, así que cada entrada sale en orden y una sola vez.
+    """
+    closed = False   # pyarrow (PythonFile) lo consulta antes de escribir
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _unique_arcname(arcname, used):
+    """EXP-1-x.jpg, EXP-1-x-2.jpg, … para que no haya nombres repetidos en el ZIP."""
+    base, dot, ext = arcname.rpartition('.')
+    candidate, i = arcname, 1
+    while candidate in used:
+        i += 1
+        candidate = f"{base}-{i}.{ext}" if dot else f"{arcname}-{i}"
+    used.add(candidate)
+    return candidate
+
+
+def _build_xlsx(expenses_qs, receipts, progress=None, manifest=None):
+    """
+    Arma el Excel en modo write-only (las filas se escriben a medida que llegan
+    de la BD, sin armar la hoja en memoria) y lo devuelve en un archivo temporal.
+
+    Recorre el queryset una sola vez: de paso completa `receipts` con
+    (arcname, nombre en storage) para que el ZIP no vuelva a consultar la BD.
+    Cada archivo distinto va una sola vez; los recibos duplicados (mismo hash)
+    linkean al que ya está en el ZIP.
+    Si viene `progress`, se llama con progress(rows=n) cada PROGRESS_EVERY filas.
+    Si viene `manifest` (dict), anota ahí los ids de gastos y cada recibo exportado.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Gastos')
     for i, w in enumerate(COL_WIDTHS, start=1):
         ws.column_dimensions[get_column_letter(i)].width = w
+    ws.append(HEADERS)
 
-    rows = []
-    for e in expenses_qs.select_related().prefetch_related('receipts').order_by('date','id'):
+    # select_related(None): el Excel no usa project/created_by, evitamos los JOIN
+    qs = expenses_qs.select_related(None).prefetch_related('receipts').order_by('date', 'id')
+    n = 0
+    arcnames = {}       # contenido (sha256 o nombre en storage) → arcname ya escrito
+    used = set()        # arcnames tomados (dos recibos del mismo gasto no se pisan)
+    for n, e in enumerate(qs.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1):
         links = []
         for r in e.receipts.all():
-            fname = r.export_filename()
-            links.append(f'=HYPERLINK("receipts/{fname}", "{fname}")')
+            key = r.sha256 or r.image.name
+            arcname = arcnames.get(key)
+            if arcname is None:
+                # Primera vez que aparece este archivo: se agrega al ZIP
+                arcname = _unique_arcname(f"receipts/{r.export_filename()}", used)
+                arcnames[key] = arcname
+                receipts.append((arcname, r.image.name))
+            if manifest is not None:
+                manifest['receipts'].append(_manifest_receipt(r, arcname))
+            fname = arcname[len('receipts/'):]
+            links.append(f'=HYPERLINK("{arcname}", "{fname}")')
         link_cell = ", ".join(links) if links else ''
-        rows.append([
+        if manifest is not None:
+            manifest['expenses'].append(e.id)
+        ws.append([
             e.id, e.date.isoformat(), e.category, e.vendor, e.description,
             float(e.amount), e.payment_method, e.project_code, e.notes, link_cell
         ])
+        if progress and n % PROGRESS_EVERY == 0:
+            progress(rows=n)
+    if progress:
+        progress(rows=n, receipts_total=len(receipts))
 
-    for row in rows:
-        ws.append(row)
-
-    out_xlsx = BytesIO()
+    out_xlsx = SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
     wb.save(out_xlsx)
     out_xlsx.seek(0)
+    return out_xlsx
+
+
+def _manifest_receipt(r, arcname):
+    return {'id': r.id, 'expense_id': r.expense_id, 'file': arcname, 'sha256': r.sha256}
+
+
+def _add_receipts(receipts_qs, receipts, manifest=None):
+    """Recibos sueltos (de gastos que no van en el Excel): se suman a `receipts` sin repetir archivos."""
+    used = {arcname for arcname, _ in receipts}
+    arcnames = {name: arcname for arcname, name in receipts}   # nombre en storage → arcname
+    qs = receipts_qs.select_related('expense').order_by('uploaded_at', 'id')
+    for r in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        arcname = arcnames.get(r.image.name)
+        if arcname is None:
+            arcname = _unique_arcname(f"receipts/{r.export_filename()}", used)
+            arcnames[r.image.name] = arcname
+            receipts.append((arcname, r.image.name))
+        if manifest is not None:
+            manifest['receipts'].append(_manifest_receipt(r, arcname))
+
+
+def _zipinfo(arcname):
+    """Entrada del ZIP: STORED si el archivo ya está comprimido, DEFLATE si no."""
+    info = ZipInfo(arcname, date_time=time.localtime()[:6])
+    ext = arcname.rsplit('.', 1)[-1].lower()
+    info.compress_type = ZIP_STORED if ext in COMPRESSED_EXTS else ZIP_DEFLATED
+    return info
+
+
+def _prefetch(storage, names, workers, executor=None):
+    """
+    Lee los archivos con un pool de threads acotado y los entrega en el mismo
+    orden de `names`. Como mucho hay 2*workers archivos leídos/en vuelo.
+    Con `executor` (el compartido del camino async, ver aio.py) se usa ese en
+    vez de armar un pool propio.
+    """
+    def read(name):
+        with storage.open(name, 'rb') as f:
+            return f.read()
+
+    names = iter(names)
+    pending = deque()
+    pool = executor or ThreadPoolExecutor(max_workers=workers)
+    try:
+        for name in names:
+            pending.append(pool.submit(read, name))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            data = pending.popleft().result()
+            name = next(names, None)
+            if name is not None:
+                pending.append(pool.submit(read, name))
+            yield data
+    finally:
+        # Si cortan el generador (cliente que se desconecta) no seguimos leyendo
+        for future in pending:
+            future.cancel()
+        if executor is None:
+            pool.shutdown(wait=True)
+
+
+def build_export(expenses_qs, progress=None, extra_receipts=None, manifest=None, executor=None):
+    """
+    Genera el ZIP (expenses.xlsx + receipts/) como un iterador de bytes.
+
+    Cada entrada se entrega apenas está lista, así que sirve directo para un
+    StreamingHttpResponse: el cliente recibe bytes desde el inicio y la memoria
+    queda acotada a los recibos leídos por adelantado (no al tamaño del ZIP).
+    Los recibos se leen en paralelo (EXPORT_IO_WORKERS) y las imágenes, que ya
+    vienen comprimidas, se guardan sin DEFLATE; solo el Excel se comprime.
+
+    `progress` es opcional (lo usan los ExportJob para informar avance): se
+    llama con keywords rows / receipts_total / receipts a medida que avanza.
+
+    Para los exports incrementales (delta.py): `extra_receipts` es un queryset
+    de recibos nuevos de gastos que no van en el Excel, y `manifest` un dict
+    que se completa con gastos y recibos exportados y va al ZIP como
+    manifest.json. `executor`: pool compartido para leer recibos (camino async).
+    """
+    if manifest is not None:
+        manifest.setdefault('expenses', [])
+        manifest.setdefault('receipts', [])
+    stream = _ZipStream()
+    with ZipFile(stream, 'w', ZIP_DEFLATED) as zf:
+        # 1) Excel
+        receipts = []
+        with timing.phase('xlsx'):
+            out_xlsx = _build_xlsx(expenses_qs, receipts, progress, manifest)
+            if extra_receipts is not None:
+                _add_receipts(extra_receipts, receipts, manifest)
+        with zf.open('expenses.xlsx', 'w') as dest:
+            for chunk in iter(lambda: out_xlsx.read(CHUNK_SIZE), b''):
+                dest.write(chunk)
+                yield stream.pop()
+        out_xlsx.close()
+
+        # 2) Recibos, leídos por adelantado en orden (lista armada en la pasada del Excel)
+        storage = Receipt._meta.get_field('image').storage
+        contents = _prefetch(storage, (name for _, name in receipts), settings.EXPORT_IO_WORKERS, executor)
+        # Con SERVER_TIMING: cuánto esperamos a que lleguen los recibos (vs. armar el Excel)
+        contents = timing.timed_iter('receipts', contents)
+        for n, ((arcname, _), data) in enumerate(zip(receipts, contents), start=1):
+            zf.writestr(_zipinfo(arcname), data)
+            yield stream.pop()
+            if progress:
+                progress(receipts=n)
+
+        # 3) Manifest (export incremental): qué gastos y recibos trae este ZIP
+        if manifest is not None:
+            zf.writestr('manifest.json', json.dumps(manifest, indent=2, default=str))
+            yield stream.pop()
+    # Directorio central del ZIP (se escribe al cerrar)
+    yield stream.pop()
+
+
+# --- Exports de solo datos (CSV / Parquet / Arrow) ---
+# Columnas de los exports de datos: (nombre en Parquet/Arrow, encabezado CSV, campo)
+DATA_COLUMNS = [
+    ('id', 'ID', 'id'),
+    ('date', 'Fecha', 'date'),
+    ('category', 'Categoría', 'category'),
+    ('vendor', 'Proveedor', 'vendor'),
+    ('description', 'Descripción', 'description'),
+    ('amount', 'Monto', 'amount'),
+    ('payment_method', 'Medio de pago', 'payment_method'),
+    ('project_id', 'Obra (ID)', 'project_id'),
+    ('project_code', 'Código/Obra', 'project_code'),
+    ('created_by_id', 'Usuario (ID)', 'created_by_id'),
+    ('notes', 'Notas', 'notes'),
+    ('receipts', 'Recibos', 'receipts_n'),
+]
+
+
+def _receipts_count():
+    """Cantidad de recibos por gasto como subconsulta (sin GROUP BY de todo el export)."""
+    receipts = (
+        Receipt.objects.filter(expense=OuterRef('pk')).order_by()
+        .values('expense').annotate(n=Count('id')).values('n')
+    )
+    return Coalesce(Subquery(receipts), 0)
+
+
+def _data_rows(expenses_qs):
+    """Tuplas en el orden de DATA_COLUMNS, de a EXPORT_CHUNK_SIZE (sin instanciar modelos)."""
+    qs = (
+        expenses_qs.select_related(None).prefetch_related(None)
+        .annotate(receipts_n=_receipts_count()).order_by('date', 'id')
+    )
+    return qs.values_list(*(field for _, _, field in DATA_COLUMNS)).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """csv.writer escribe acá y devuelve la línea, para ir entregándola."""
+    def write(self, value):
+        return value
+
+
+def build_csv(expenses_qs):
+    """
+    CSV (UTF-8, separador coma) con las filas filtradas, como iterador de
+    bytes para StreamingHttpResponse. Montos con punto decimal y exactos
+    (sin pasar por float), fechas ISO.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for _, header, _ in DATA_COLUMNS]).encode()
+    lines = []
+    for row in _data_rows(expenses_qs):
+        lines.append(writer.writerow(row))
+        if len(lines) >= PROGRESS_EVERY:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def arrow_available():
+    return pa is not None
+
+
+def _arrow_schema():
+    amount = Expense._meta.get_field('amount')
+    types = {
+        'id': pa.int64(), 'date': pa.date32(), 'amount': pa.decimal128(amount.max_digits, amount.decimal_places),
+        'project_id': pa.int64(), 'created_by_id': pa.int64(), 'receipts': pa.int32(),
+    }
+    return pa.schema([
+        pa.field(name, types.get(name, pa.string()), nullable=name not in ('id', 'date', 'amount', 'receipts'))
+        for name, _, _ in DATA_COLUMNS
+    ])
+
+
+def build_columnar(expenses_qs, fmt='parquet'):
+    """
+    Parquet (fmt='parquet') o Arrow IPC (fmt='arrow') con tipos reales: monto
+    decimal(12,2), fecha date32, ids int64. Se escribe de a EXPORT_CHUNK_SIZE
+    filas (un row group / record batch por lote) y cada lote sale apenas se
+    escribe, así que la memoria no depende del tamaño del export.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow requiere pyarrow (pip install pyarrow).")
+    schema = _arrow_schema()
+    stream = _ZipStream()
+    sink = pa.PythonFile(stream, mode='w')   # no seekable: Parquet/IPC escriben en orden
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+        write = writer.write_batch
+
+    def flush(rows):
+        columns = list(zip(*rows))
+        write(pa.record_batch([pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema))
+
+    rows = []
+    for row in _data_rows(expenses_qs):
+        rows.append(row)
+        if len(rows) >= EXPORT_CHUNK_SIZE:
+            flush(rows)
+            rows = []
+            yield stream.pop()
+    if rows:
+        flush(rows)
+    writer.close()
+    yield stream.pop()
+
+
+# --- Export ZIP en partes (por obra o por mes, cada parte acotada) ---
+PART_GROUPS = ('project', 'month')
+# Filas máximas por parte (además del tope de recibos, EXPORT_PART_MAX_RECEIPTS)
+PART_MAX_ROWS = 50000
+
+
+def export_parts(expenses_qs, by='month', max_receipts=None):
+    """
+    Divide el export en partes: una por obra o por mes y, si el grupo supera
+    max_receipts recibos (o PART_MAX_ROWS filas), en tramos consecutivos de
+    (fecha, id). Una sola pasada por los índices (obra, fecha, id) / (fecha, id),
+    sin traer los gastos.
+
+    Cada parte es un dict con group / label / first / last ("AAAA-MM-DD_id")
+    / rows / receipts; part_queryset() reconstruye sus gastos a partir de eso.
+    """
+    max_receipts = max_receipts or settings.EXPORT_PART_MAX_RECEIPTS
+    ordering = ('date', 'id') if by == 'month' else ('project_id', 'date', 'id')
+    rows = (
+        expenses_qs.select_related(None).prefetch_related(None)
+        .annotate(receipts_n=_receipts_count())
+        .order_by(*ordering).values_list('project_id', 'date', 'id', 'receipts_n')
+    )
+    parts = []
+    current = None
+    for project_id, date, pk, n in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        key = date.strftime('%Y-%m') if by == 'month' else ('none' if project_id is None else str(project_id))
+        position = f"{date.isoformat()}_{pk}"
+        if (current is None or current['group'] != key or current['rows'] >= PART_MAX_ROWS
+                or (current['receipts'] + n > max_receipts and current['rows'])):
+            current = {'group': key, 'first': position, 'rows': 0, 'receipts': 0}
+            parts.append(current)
+        current['last'] = position
+        current['rows'] += 1
+        current['receipts'] += n
+
+    labels = {}
+    if by == 'project':
+        ids = {int(p['group']) for p in parts if p['group'] != 'none'}
+        labels = {str(pk): str(p) for pk, p in Project.objects.in_bulk(ids).items()}
+    for number, part in enumerate(parts, start=1):
+        part['number'] = number
+        part['label'] = labels.get(part['group'], 'sin-obra' if part['group'] == 'none' else part['group'])
+    return parts
+
+
+def _position(value):
+    date, pk = value.split('_')
+    return datetime.date.fromisoformat(date), int(pk)
+
 
-    # 2) ZIP with excel + receipts
-    zip_buffer = BytesIO()
-    with ZipFile(zip_buffer, 'w', ZIP_DEFLATED) as zf:
-        zf.writestr('expenses.xlsx', out_xlsx.getvalue())
-        for e in expenses_qs.prefetch_related('receipts'):
-            for r in e.receipts.all():
-                arcname = f"receipts/{r.export_filename()}"
-                with r.image.open('rb') as f:
-                    zf.writestr(arcname, f.read())
-    zip_buffer.seek(0)
-    return zip_buffer
+def part_queryset(expenses_qs, by, group, first, last):
+    """Gastos de una parte de export_parts() (ValueError si los parámetros no son válidos)."""
+    if by == 'month':
+        # Rango de fechas (no date__month): así sigue usando los índices por fecha
+        start = datetime.date(*(int(x) for x in group.split('-')), 1)
+        end = (start + datetime.timedelta(days=31)).replace(day=1)
+        qs = expenses_qs.filter(date__gte=start, date__lt=end)
+    elif by == 'project':
+        qs = expenses_qs.filter(project__isnull=True) if group == 'none' else expenses_qs.filter(project_id=int(group))
+    else:
+        raise ValueError(f"Agrupación desconocida: {by}")
+    # Tramo [first, last] en orden (fecha, id)
+    (first_date, first_id), (last_date, last_id) = _position(first), _position(last)
+    return qs.filter(
+        Q(date__gt=first_date) | Q(date=first_date, id__gte=first_id),
+        Q(date__lt=last_date) | Q(date=last_date, id__lte=last_id),
+    )
@@ -3,25 +3,34 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.views import View
 from django.views.generic import ListView
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse, FileResponse, JsonResponse, Http404, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.utils.safestring import mark_safe
+from django.contrib.messages import get_messages
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Sum
 
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.http import require_POST
 
-from .models import Expense, Receipt, Project
-from .forms import ExpenseForm, ReceiptForm, ExpenseFilterForm
-from .utils import build_export
-
-
-# --- Helper: ¿el usuario es manager? ---
-def is_manager(user):
-    return user.is_authenticated and (
-        user.is_superuser or user.groups.filter(name__in=["Manager", "Managers"]).exists()
-    )
+from .models import Expense, Receipt, Project, ExportJob, ExpenseRollup
+from .forms import ExpenseForm, ReceiptForm, ExpenseFilterForm, ExpenseImportForm, ExpenseBatchFormSet
+from .utils import PART_GROUPS, arrow_available, build_columnar, build_csv, build_export, export_parts, part_queryset
+from .images import process_uploads
+from .pagination import paginate_keyset
+from .deletion import delete_expenses, discard_stored_files
+from .filters import filter_expenses, export_filename
+from .importer import import_expenses
+from .roles import is_manager   # cacheado por request y por proceso (ver roles.py)
+from . import choices, delta, export_cache, list_cache, rollups, search, serving, suggest
 
 
 # --- Crear gasto ---
@@ -41,13 +50,27 @@ class ExpenseCreateView(View):
         files = request.FILES.getlist('image')
 
         if form.is_valid():
-            expense = form.save(commit=False)
-            # Con login obligatorio, siempre seteamos owner
-            expense.created_by = request.user
-            expense.save()
-
-            for f in files:
-                Receipt.objects.create(expense=expense, image=f)
+            # Orientación, tope de resolución, re-encode y miniatura (ver images.py), y subida al storage;
+            # si el gasto no llega a guardarse, los archivos ya subidos se encolan para borrar
+            processed = process_uploads([(f.name, f.read()) for f in files])
+            receipts = [
+                Receipt(image=image, thumbnail=thumb or '', processed=thumb is not None, original_name=f.name)
+                for f, (image, thumb) in zip(files, processed)
+            ]
+            try:
+                for r in receipts:
+                    r.store_files()
+                with transaction.atomic():
+                    expense = form.save(commit=False)
+                    # Con login obligatorio, siempre seteamos owner
+                    expense.created_by = request.user
+                    expense.save()
+                    for r in receipts:
+                        r.expense = expense
+                        r.save()   # archivos ya guardados: solo la fila (y los signals)
+            except Exception:
+                discard_stored_files(receipts)
+                raise
 
             messages.success(request, 'Gasto cargado correctamente. Podés cargar otro.')
             return redirect(reverse('expense-create'))
@@ -56,7 +79,87 @@ class ExpenseCreateView(View):
         return render(request, self.template_name, {'form': form, 'rform': ReceiptForm()})
 
 
-# --- Filtro compartido (lista + export) ---
+# --- Carga por lote: varias filas (cada una con sus recibos) en un solo request ---
+@method_decorator(login_required, name='dispatch')
+class ExpenseBatchCreateView(View):
+    template_name = 'expenses/expense_batch_form.html'
+
+    def _formset(self, request, data=None):
+        projects = {p.pk: p for p in Project.objects.order_by('code', 'name')}
+        try:
+            extra = min(max(int(request.GET.get('filas', 5)), 1), 50)
+        except ValueError:
+            extra = 5
+        formset = ExpenseBatchFormSet(data, form_kwargs={'projects': projects})
+        formset.extra = extra
+        return formset
+
+    def get(self, request):
+        return render(request, self.template_name, {'formset': self._formset(request)})
+
+    def post(self, request):
+        formset = self._formset(request, request.POST)
+        if not formset.is_valid():
+            messages.error(request, 'Revisá los campos marcados.')
+            return render(request, self.template_name, {'formset': formset})
+
+        rows, ignored = [], []
+        for f in formset:
+            files = request.FILES.getlist(f"{f.prefix}-image")
+            if f.has_changed():
+                rows.append((f, files))
+            elif files:
+                ignored.append(f)
+        # Recibos en una fila vacía: se perderían sin aviso
+        for f in ignored:
+            f.add_error(None, 'Adjuntaste recibos en una fila vacía: completá el gasto o quitá los archivos.')
+        if ignored:
+            messages.error(request, 'Revisá los campos marcados.')
+            return render(request, self.template_name, {'formset': formset})
+        if not rows:
+            messages.error(request, 'No cargaste ninguna fila.')
+            return render(request, self.template_name, {'formset': formset})
+
+        # Imágenes: se procesan y se suben antes de abrir la transacción (ver images.py / blobs.py);
+        # si algo falla después, los archivos ya subidos se encolan para borrar
+        uploads = [upload for _, files in rows for upload in files]
+        processed = iter(process_uploads([(u.name, u.read()) for u in uploads]))
+        pending, stored = [], []
+        try:
+            for f, files in rows:
+                receipts = []
+                for upload in files:
+                    image, thumb = next(processed)
+                    receipt = Receipt(image=image, thumbnail=thumb or '',
+                                      processed=thumb is not None, original_name=upload.name)
+                    receipt.store_files()
+                    stored.append(receipt)
+                    receipts.append(receipt)
+                expense = f.save(commit=False)
+                expense.created_by = request.user
+                pending.append((expense, receipts))
+
+            # Todo o nada: gastos y recibos con bulk_create en una sola transacción
+            with transaction.atomic():
+                expenses = Expense.objects.bulk_create([e for e, _ in pending])
+                rollups.add_expenses(expenses)  # bulk_create no dispara signals
+                receipts = []
+                for expense, rs in pending:
+                    for r in rs:
+                        r.expense = expense
+                        receipts.append(r)
+                Receipt.objects.bulk_create(receipts)
+        except Exception:
+            discard_stored_files(stored)
+            raise
+        suggest.add_expenses(expenses)
+        list_cache.bump([request.user.pk])
+
+        messages.success(request, f'Se cargaron {len(expenses)} gasto(s) con {len(receipts)} recibo(s).')
+        return redirect(reverse('expense-batch-create'))
+
+
+# --- Filtro compartido (lista + export; el worker usa filters.filter_expenses) ---
 def _filtered_queryset(request):
     """
     Aplica los mismos filtros que la lista y respeta permisos:
@@ -65,66 +168,76 @@ def _filtered_queryset(request):
     - user (id) solo para managers
     - operadores ven solo lo propio; anónimo no ve nada
     """
-    qs = (
-        Expense.objects
-        .select_related('project', 'created_by')
-        .prefetch_related('receipts')
-        .order_by('-date', '-id')
-    )
-
-    form = ExpenseFilterForm(request.GET or None, user=request.user)
-
-    if form.is_valid():
-        start = form.cleaned_data.get('start')
-        end = form.cleaned_data.get('end')
-        project = form.cleaned_data.get('project')
-        user_obj = form.cleaned_data.get('user')
-
-        if start:
-            qs = qs.filter(date__gte=start)
-        if end:
-            qs = qs.filter(date__lte=end)
-        if project:
-            qs = qs.filter(project=project)
-
-        if is_manager(request.user):
-            if user_obj:
-                qs = qs.filter(created_by=user_obj)
-        else:
-            if request.user.is_authenticated:
-                qs = qs.filter(created_by=request.user)
-            else:
-                qs = qs.none()
-    else:
-        # Sin form válido, aplicamos visibilidad básica
-        if request.user.is_authenticated and not is_manager(request.user):
-            qs = qs.filter(created_by=request.user)
-        elif not request.user.is_authenticated:
-            qs = qs.none()
-
-    return qs, form
+    return filter_expenses(request.GET or None, request.user)
 
 
 # --- Listado ---
 class ExpenseListView(LoginRequiredMixin, ListView):  # requiere login para ver la lista
     model = Expense
     template_name = 'expenses/expense_list.html'
+    table_template_name = 'expenses/expense_table.html'
     context_object_name = 'expenses'
     paginate_by = 20
     ordering = ['-date', '-id']
 
+    def get(self, request, *args, **kwargs):
+        # La tabla se cachea por usuario/filtros/versión de datos (ver list_cache.py):
+        # con la misma clave no se consultan gastos ni se renderiza la tabla, y si el
+        # navegador ya la tiene (mismo ETag) respondemos 304.
+        self._qs, self._form = _filtered_queryset(request)
+        self.object_list = self._qs   # perezoso: solo se evalúa si hay que renderizar la tabla
+        key = list_cache.cache_key(request, is_manager(request.user))
+        jobs = list(
+            ExportJob.objects.filter(created_by=request.user).exclude(status='expired')[:5]
+        )
+        etag = list_cache.etag(key, [(j.pk, j.status) for j in jobs])
+        # Con mensajes pendientes hay que renderizar (si no, se pierden sin mostrarse)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')) and not list(get_messages(request)):
+            response = HttpResponseNotModified()
+        else:
+            table = list_cache.get(key)
+            if table is None:
+                self.object_list = self.get_queryset()
+                table = render_to_string(self.table_template_name, self.get_context_data(), request)
+                list_cache.store(key, table)
+            response = self.render_to_response({
+                'filter_form': self._form,
+                'export_jobs': jobs,
+                'expense_table': mark_safe(table),
+                'arrow_available': arrow_available(),
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def get_queryset(self):
-        # Guardamos para reusar en el contexto sin recalcular
-        self._qs, self._form = _filtered_queryset(self.request)
+        if self._search_term():
+            # Con búsqueda: primero lo más relevante
+            return search.rank_queryset(self._qs, self._search_term())
         return self._qs
 
+    def _search_term(self):
+        return self._form.cleaned_data.get('q') if self._form.is_valid() else ''
+
+    def paginate_queryset(self, queryset, page_size):
+        # Modo cursor (default): seek sobre (date, id), sin OFFSET ni COUNT(*).
+        # Los resultados de una búsqueda van por relevancia: ahí se pagina con ?page=N.
+        if settings.EXPENSE_LIST_PAGINATION != 'cursor' or self._search_term():
+            return super().paginate_queryset(queryset, page_size)
+        page = paginate_keyset(queryset, self.request.GET.get('cursor'), page_size)
+        return (None, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self, **kwargs):
+        """Contexto de la tabla (solo se arma cuando no está en cache)."""
         ctx = super().get_context_data(**kwargs)
-        # Usamos lo ya calculado en get_queryset()
-        if not hasattr(self, '_form'):
-            _, self._form = _filtered_queryset(self.request)
-        ctx['filter_form'] = self._form
-        ctx['is_manager'] = is_manager(self.request.user)
+        # Filtros actuales sin los parámetros de paginación (para armar los links)
+        params = self.request.GET.copy()
+        for key in ('cursor', 'page', 'count'):
+            params.pop(key, None)
+        ctx['filter_query'] = params.urlencode()
+        # El total es opcional: solo se cuenta si lo piden (?count=1)
+        if self.request.GET.get('count'):
+            ctx['total_count'] = self._qs.count()
         return ctx
 
 
@@ -132,40 +245,253 @@ class ExpenseListView(LoginRequiredMixin, ListView):  # requiere login para ver
 @login_required  # requiere login para exportar
 def export_zip(request):
     qs, form = _filtered_queryset(request)
-    buf = build_export(qs)
-
-    # Nombre de archivo amigable: usuario / periodo
-    who = "ALL"
-    if is_manager(request.user):
-        u = form.cleaned_data.get('user') if form.is_valid() else None
-        if u:
-            who = u.username
-    elif request.user.is_authenticated:
-        who = request.user.username
-
-    start = form.cleaned_data.get('start') if form.is_valid() else None
-    end = form.cleaned_data.get('end') if form.is_valid() else None
-    period = (
-        f"{start.isoformat() if start else ''}_to_{end.isoformat() if end else ''}".strip('_')
-        or 'all'
-    )
+    return _zip_response(request, form, qs, export_filename(form, request.user))
+
+
+def _zip_response(request, form, qs, fname, part=None):
+    # Mismo filtro + mismo alcance + mismos datos → servimos el ZIP ya armado
+    key = export_cache.cache_key(form, request.user, is_manager(request.user), qs, part)
+    cached = export_cache.get(key)
+    if cached:
+        resp = FileResponse(cached, content_type='application/zip')
+    else:
+        # Streaming: el ZIP se arma entrada por entrada mientras se envía (y se guarda en cache)
+        resp = StreamingHttpResponse(export_cache.store(key, build_export(qs)),
+                                     content_type='application/zip')
+    resp['Content-Disposition'] = f'attachment; filename=\"{fname}\"'
+    return resp
+
+
+# --- Export incremental: solo lo cargado desde el último delta de este usuario+filtro ---
+@login_required
+def export_delta(request):
+    qs, form = _filtered_queryset(request)
+    params = request.GET.copy()
+    repeat = bool(params.pop('repetir', None))
+    chunks = delta.build(qs, form, request.user, is_manager(request.user),
+                         query=params.urlencode(), repeat=repeat)
+    fname = export_filename(form, request.user, suffix=f"-novedades-{timezone.localdate():%Y%m%d}")
+    resp = StreamingHttpResponse(chunks, content_type='application/zip')
+    resp['Content-Disposition'] = f'attachment; filename=\"{fname}\"'
+    return resp
+
+
+# --- Export en partes: índice (JSON) y descarga de cada parte ---
+PART_PARAMS = ('por', 'grupo', 'desde', 'hasta')
+
+
+@login_required
+def export_zip_parts(request):
+    """Partes del export (por obra o mes, acotadas en recibos), cada una con su URL."""
+    by = request.GET.get('por', 'month')
+    if by not in PART_GROUPS:
+        raise Http404("Agrupación desconocida (por=project o por=month).")
+    qs, _ = _filtered_queryset(request)
+    params = request.GET.copy()
+    for key in PART_PARAMS + ('cursor', 'page', 'count'):
+        params.pop(key, None)
+    parts = export_parts(qs, by)
+    for part in parts:
+        params['por'], params['grupo'], params['desde'], params['hasta'] = by, part['group'], part['first'], part['last']
+        part['url'] = f"{reverse('export-zip-part')}?{params.urlencode()}"
+    return JsonResponse({'by': by, 'parts': parts})
+
 
-    fname = f"absl-expenses-{who}-{period}.zip".replace('..', '.')
-    resp = HttpResponse(buf.getvalue(), content_type='application/zip')
+@login_required
+def export_zip_part(request):
+    qs, form = _filtered_queryset(request)
+    try:
+        part = [request.GET[key] for key in PART_PARAMS]
+        qs = part_queryset(qs, *part)
+    except (KeyError, ValueError):
+        raise Http404("Parte de export inválida.")
+    by, group, first, _ = part
+    fname = export_filename(form, request.user, suffix=f"-{by}-{group}-{first}")
+    return _zip_response(request, form, qs, fname, part)
+
+
+# --- Exports de solo datos (mismos filtros/permiso): CSV en streaming, Parquet/Arrow ---
+DATA_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+
+@login_required
+def export_data(request, fmt):
+    if fmt != 'csv' and not arrow_available():
+        raise Http404("Parquet/Arrow no está disponible en este servidor (falta pyarrow).")
+    qs, form = _filtered_queryset(request)
+    chunks = build_csv(qs) if fmt == 'csv' else build_columnar(qs, fmt)
+    fname = export_filename(form, request.user, ext=fmt)
+    resp = StreamingHttpResponse(chunks, content_type=DATA_CONTENT_TYPES[fmt])
     resp['Content-Disposition'] = f'attachment; filename=\"{fname}\"'
     return resp
 
 
+# --- Autocomplete: obras/usuarios de los filtros y proveedor/categoría de la carga ---
+@login_required
+def autocomplete(request, kind):
+    term = request.GET.get('q', '').strip()
+    if kind in suggest.FIELDS:
+        # Proveedor/categoría: índice de prefijos en memoria, sin tocar la BD
+        results = [{'id': value, 'text': value} for value in suggest.search(kind, term)]
+        max_age = 300
+    elif kind in choices.SOURCES:
+        if kind == 'users' and not is_manager(request.user):
+            raise PermissionDenied("Solo managers pueden filtrar por usuario.")
+        results = choices.search(kind, term)
+        max_age = 60
+    else:
+        raise Http404
+    resp = JsonResponse({'results': results})
+    resp['Cache-Control'] = f'private, max-age={max_age}'
+    return resp
+
+
+# --- Archivos de recibos (con permiso; los bytes los manda el front server si se puede) ---
+@login_required
+def receipt_file(request, pk, variant='image'):
+    """Foto (o miniatura) de un recibo: el dueño del gasto o un manager."""
+    name, filename = receipt_file_name(request, pk, variant)
+    storage = Receipt._meta.get_field('image').storage
+    return serving.serve(request, storage, name, filename)
+
+
+def receipt_file_name(request, pk, variant='image'):
+    """(nombre en storage, nombre original) si el usuario puede ver el recibo; si no, 404."""
+    row = (
+        Receipt.objects.filter(pk=pk)
+        .values('image', 'thumbnail', 'original_name', 'expense__created_by_id')
+        .first()
+    )
+    if row is None or not (row['expense__created_by_id'] == request.user.pk or is_manager(request.user)):
+        raise Http404
+    name = row['thumbnail'] if variant == 'thumbnail' else row['image']
+    if not name:
+        raise Http404
+    return name, row['original_name'] or None
+
+
+# --- Export en segundo plano (ExportJob + worker run_export_jobs) ---
+@login_required
+@require_POST
+def export_job_create(request):
+    """Encola un ExportJob con los filtros actuales de la lista."""
+    job = ExportJob.objects.create(created_by=request.user, query=request.GET.urlencode())
+    messages.success(request, f"Export #{job.pk} en cola. Te avisamos acá cuando esté listo.")
+    next_url = request.POST.get('next') or reverse('expense-list')
+    return redirect(next_url)
+
+
+def _get_job(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk)
+    if job.created_by_id != request.user.pk and not request.user.is_superuser:
+        raise PermissionDenied("Este export no es tuyo.")
+    return job
+
+
+@login_required
+def export_job_status(request, pk):
+    """Estado/progreso del job en JSON (lo consulta la lista cada unos segundos)."""
+    job = _get_job(request, pk)
+    ready = job.status == 'done' and not job.is_expired()
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'receipts_done': job.receipts_done,
+        'receipts_total': job.receipts_total,
+        'error': job.error,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'download_url': reverse('export-job-download', args=[job.pk]) if ready else None,
+    })
+
+
+@login_required
+def export_job_download(request, pk):
+    job = _get_job(request, pk)
+    if job.status != 'done' or job.is_expired() or not job.file:
+        raise Http404("El export no está disponible (en proceso o vencido).")
+    return FileResponse(job.file.open('rb'), as_attachment=True,
+                        filename=job.filename or None, content_type='application/zip')
+
+
+# --- Import masivo CSV/XLSX (solo managers) ---
+@login_required
+def expense_import(request):
+    """Sube un CSV/XLSX y crea los gastos a nombre del usuario. Informa errores por fila."""
+    if not is_manager(request.user):
+        raise PermissionDenied("Solo managers pueden importar gastos.")
+
+    result = None
+    form = ExpenseImportForm(request.POST or None, request.FILES or None)
+    if request.method == 'POST' and form.is_valid():
+        upload = form.cleaned_data['file']
+        result = import_expenses(getattr(upload, 'file', upload), upload.name, request.user)
+        if result.created:
+            messages.success(request, f"Se importaron {result.created} gasto(s).")
+        if result.error_count:
+            messages.warning(request, f"{result.error_count} fila(s) con errores (no se importaron).")
+
+    return render(request, 'expenses/expense_import.html', {'form': form, 'result': result})
+
+
+# --- Resumen de gastos (lee de ExpenseRollup, no de la tabla de gastos) ---
+@login_required
+def expense_summary(request):
+    """Totales por mes, obra, usuario y categoría con los mismos filtros/permisos que la lista."""
+    manager = is_manager(request.user)
+    form = ExpenseFilterForm(request.GET or None, user=request.user)
+    qs = ExpenseRollup.objects.all()
+
+    if form.is_valid():
+        start = form.cleaned_data.get('start')
+        end = form.cleaned_data.get('end')
+        # Los rollups son mensuales: el filtro de fechas se redondea al mes
+        if start:
+            qs = qs.filter(period__gte=start.replace(day=1))
+        if end:
+            qs = qs.filter(period__lte=end)
+        if form.cleaned_data.get('project'):
+            qs = qs.filter(project=form.cleaned_data['project'])
+        if manager and form.cleaned_data.get('user'):
+            qs = qs.filter(user=form.cleaned_data['user'])
+    if not manager:
+        qs = qs.filter(user=request.user)
+
+    def grouped(fields, order):
+        return (
+            qs.order_by().values(*fields)
+            .annotate(total=Sum('total'), count=Sum('count'))
+            .order_by(order)
+        )
+
+    totals = qs.aggregate(total=Sum('total'), count=Sum('count'))
+    return render(request, 'expenses/expense_summary.html', {
+        'filter_form': form,
+        'totals': totals,
+        'by_month': grouped(['period'], '-period'),
+        'by_project': grouped(['project__code', 'project__name'], '-total'),
+        'by_user': grouped(['user__username'], '-total') if manager else None,
+        'by_category': grouped(['category'], '-total'),
+    })
+
+
 # --- Borrado individual (Managers o superusuarios) ---
 @login_required
 @require_POST
 def delete_expense(request, pk):
     """Borra un gasto individual. Permitido para Managers o superusuarios."""
-    if not (request.user.is_superuser or is_manager(request.user)):
+    if not is_manager(request.user):
         raise PermissionDenied("Solo managers o superusuarios pueden borrar gastos.")
 
     expense = get_object_or_404(Expense, pk=pk)
-    expense.delete()  # Receipt tiene on_delete=CASCADE → borra fotos asociadas
+    # Mismo camino que el borrado masivo: los archivos se encolan para el worker
+    delete_expenses(Expense.objects.filter(pk=expense.pk))
 
     messages.success(request, f"Gasto #{pk} borrado.")
     next_url = request.POST.get('next') or reverse('expense-list')
@@ -177,12 +503,12 @@ def delete_expense(request, pk):
 @require_POST
 def bulk_delete_expenses(request):
     """Borra TODOS los gastos actualmente listados según los filtros. Managers o superusuarios."""
-    if not (request.user.is_superuser or is_manager(request.user)):
+    if not is_manager(request.user):
         raise PermissionDenied("Solo managers o superusuarios pueden borrar gastos.")
 
     qs, _ = _filtered_queryset(request)
-    count = qs.count()
-    qs.delete()  # borra en cascada receipts
+    # Por lotes, cada uno en su transacción; los archivos los borra el worker después
+    count = delete_expenses(qs)
 
     messages.success(request, f"Se borraron {count} gasto(s).")
     next_url = request.POST.get('next') or reverse('expense-list')
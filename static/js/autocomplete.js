@@ -0,0 +1,59 @@
+// Filtros con muchas opciones: el <select> viene solo con lo elegido y
+// data-autocomplete-url; acá le agregamos un buscador que trae las opciones.
+// Los inputs con data-suggest-url (proveedor/categoría) reciben sugerencias.
+(function () {
+  function setup(select) {
+    var input = document.createElement('input');
+    input.type = 'search';
+    input.className = 'form-control form-control-sm mb-1';
+    input.placeholder = 'Buscar…';
+    select.parentNode.insertBefore(input, select);
+
+    var timer = null;
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(input.value.trim());
+        fetch(url, {headers: {'Accept': 'application/json'}})
+          .then(function (r) { return r.json(); })
+          .then(function (data) {
+            var current = select.value;
+            // Conservamos la opción vacía y la elegida; el resto se reemplaza
+            Array.from(select.options).forEach(function (opt) {
+              if (opt.value && opt.value !== current) { opt.remove(); }
+            });
+            data.results.forEach(function (item) {
+              if (String(item.id) === current) { return; }
+              select.add(new Option(item.text, item.id));
+            });
+          });
+      }, 200);
+    });
+  }
+
+  // Proveedor/categoría: <datalist> con los valores más usados que empiezan igual
+  function suggest(input, n) {
+    var list = document.createElement('datalist');
+    list.id = (input.id || input.name) + '-suggestions-' + n;
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.appendChild(list);
+
+    var timer = null;
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = input.dataset.suggestUrl + '?q=' + encodeURIComponent(input.value.trim());
+        fetch(url, {headers: {'Accept': 'application/json'}})
+          .then(function (r) { return r.json(); })
+          .then(function (data) {
+            list.innerHTML = '';
+            data.results.forEach(function (item) { list.appendChild(new Option(item.text)); });
+          });
+      }, 150);
+    });
+  }
+
+  document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+  document.querySelectorAll('input[data-suggest-url]').forEach(suggest);
+})();